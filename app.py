@@ -70,7 +70,7 @@ def create_map(features, center_lat, center_lon):
     return m
 
 # Custom CSS for modern UI with enhanced theming
-st.markdown("""
+APP_CSS = """
     <style>
     /* Import Google Fonts */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&family=JetBrains+Mono:wght@400;500&display=swap');
@@ -637,7 +637,14 @@ st.markdown("""
         outline-offset: 2px !important;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _inject_css():
+    # Build the compacted stylesheet once per server instead of on every rerun
+    return "\n".join(line.strip() for line in APP_CSS.splitlines() if line.strip())
+
+st.markdown(_inject_css(), unsafe_allow_html=True)
 
 st.set_page_config(layout="wide")
 
@@ -900,6 +907,10 @@ with results_col:
                     'lat': latitude,
                     'lon': longitude
                 }
+                st.session_state.alaska_search_results['_summary'] = {
+                    'total': len(all_features),
+                    'platforms': [platform for platform in platforms if platform in st.session_state.alaska_search_results]
+                }
                 st.success(f"Found {len(all_features)} results!")
                 
                 if failed_platforms:
@@ -918,9 +929,10 @@ with results_col:
         st.rerun()
     
     # Enhanced search summary
-    if st.session_state.alaska_search_results:
-        total_results = sum(len(features) for platform, features in st.session_state.alaska_search_results.items() if not platform.startswith('_'))
-        platforms_with_data = [platform for platform, features in st.session_state.alaska_search_results.items() if not platform.startswith('_') and features]
+    summary = st.session_state.alaska_search_results.get('_summary')
+    if summary:
+        total_results = summary['total']
+        platforms_with_data = summary['platforms']
         
         st.markdown("""
             <div class='compact-card'>
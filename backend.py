@@ -2,12 +2,19 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import requests
+from requests.adapters import HTTPAdapter
+import ssl
+import certifi
 import os
 import json
 import subprocess
 from typing import List, Optional
 import uvicorn
 import asyncio
+import aiohttp
+import hashlib
+import importlib.util
+import time
 from fastapi.responses import StreamingResponse
 import io
 
@@ -25,6 +32,35 @@ app.add_middleware(
 # Add this at the top after imports
 download_statuses = {}
 
+# Single TLS context shared by every pooled HTTPS connection
+SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+class SSLContextAdapter(HTTPAdapter):
+    """HTTPAdapter that hands the shared SSL context to urllib3"""
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = SSL_CONTEXT
+        return super().init_poolmanager(*args, **kwargs)
+
+SESSION = requests.Session()
+SESSION.mount("https://", SSLContextAdapter())
+
+# Access tokens live 10 minutes on CDSE; refresh a minute early
+TOKEN_TTL = 540
+_token_cache = {}
+_http_session = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the app-wide aiohttp session, creating it on first use"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=SSL_CONTEXT))
+    return _http_session
+
+@app.on_event("shutdown")
+async def close_http_session():
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+
 class SearchRequest(BaseModel):
     username: str
     password: str
@@ -47,8 +83,13 @@ class DownloadStatus(BaseModel):
     total_size: int
     error: Optional[str] = None
 
-def get_keycloak_token(username: str, password: str) -> str:
+async def get_keycloak_token(username: str, password: str) -> str:
     """Get access token from Copernicus using username and password"""
+    cache_key = (username, hashlib.sha256(password.encode()).hexdigest())
+    cached = _token_cache.get(cache_key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
     data = {
         "client_id": "cdse-public",
         "username": username,
@@ -56,29 +97,41 @@ def get_keycloak_token(username: str, password: str) -> str:
         "grant_type": "password",
     }
     try:
-        r = requests.post(
+        session = await get_http_session()
+        async with session.post(
             "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token",
             data=data,
-        )
-        r.raise_for_status()
-        return r.json()["access_token"]
+        ) as r:
+            r.raise_for_status()
+            token = (await r.json())["access_token"]
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
-def search_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000):
-    """Search for products in the Copernicus catalog"""
-    url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products"
-    params = {
+    # Evict expired entries so logins from many users don't accumulate
+    now = time.monotonic()
+    for key in [k for k, (_, expires) in _token_cache.items() if expires <= now]:
+        del _token_cache[key]
+    _token_cache[cache_key] = (token, now + TOKEN_TTL)
+    return token
+
+def build_search_params(bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000):
+    """Build the OData query parameters for a catalog search"""
+    return {
         "$filter": f"Collection/Name eq '{collection}' and OData.CSC.Intersects(area=geography'SRID=4326;{bbox}') and ContentDate/Start gt {start_date}T00:00:00.000Z and ContentDate/Start lt {end_date}T23:59:59.999Z",
         "$count": "True",
         "$top": result_limit
     }
+
+async def search_products(token: str, params: dict):
+    """Search for products in the Copernicus catalog"""
+    url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products"
     headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        session = await get_http_session()
+        async with session.get(url, params=params, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
@@ -105,15 +158,15 @@ def run_download_process(product_id: str, token: str, product_name: str, output_
 async def search(request: SearchRequest):
     """Search for products in the Copernicus catalog"""
     try:
-        token = get_keycloak_token(request.username, request.password)
-        results = search_products(
-            token=token,
+        token = await get_keycloak_token(request.username, request.password)
+        params = build_search_params(
             bbox=request.bbox,
             collection=request.collection,
             start_date=request.start_date,
             end_date=request.end_date,
             result_limit=request.result_limit
         )
+        results = await search_products(token, params)
         return {"token": token, "results": results}
     except HTTPException as e:
         raise e
@@ -161,8 +214,7 @@ async def download_worker(product_id: str, token: str, product_name: str, output
     """Worker function to handle download in a separate task"""
     try:
         output_path = os.path.join(output_dir, f"{product_name}.zip")
-        session = requests.Session()
-        session.headers.update({"Authorization": f"Bearer {token}"})
+        headers = {"Authorization": f"Bearer {token}"}
         
         url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
         
@@ -171,15 +223,15 @@ async def download_worker(product_id: str, token: str, product_name: str, output
         
         # Follow redirects
         print("[DEBUG] Following redirects...")
-        response = session.get(url, allow_redirects=False)
+        response = SESSION.get(url, headers=headers, allow_redirects=False)
         while response.status_code in (301, 302, 303, 307):
             url = response.headers["Location"]
             print(f"[DEBUG] Redirected to: {url}")
-            response = session.get(url, allow_redirects=False)
+            response = SESSION.get(url, headers=headers, allow_redirects=False)
         
         # Get file size
         print("[DEBUG] Getting file size...")
-        file_response = session.get(url, stream=True, verify=False)
+        file_response = SESSION.get(url, headers=headers, stream=True)
         total_size = int(file_response.headers.get('content-length', 0))
         print(f"[DEBUG] Total file size: {total_size / (1024*1024):.2f} MB")
         
@@ -223,4 +275,13 @@ async def download_worker(product_id: str, token: str, product_name: str, output
         })
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # download_statuses is per-process, so keep one worker unless
+    # WEB_CONCURRENCY is raised explicitly
+    uvicorn.run(
+        "backend:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+    ) 
\ No newline at end of file
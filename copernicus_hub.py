@@ -4,14 +4,138 @@ import geopandas as gpd
 from datetime import date, datetime, timedelta
 import asyncio
 import aiohttp
-import io
+import aiofiles
+import json
+import numpy as np
+import shapely
 import os
+import atexit
+import errno
+import random
+import shutil
+import socket
+import string
+import time
 import requests
-from shapely.geometry import shape
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from download_utils import CHUNK_SIZE, REDIRECT_STATUSES, AioSessionRegistry, preallocate, get_following_redirects
+from utils import bbox_wkt
 
 # Copernicus API endpoints
 COPERNICUS_AUTH_URL = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
 COPERNICUS_CATALOG_URL = "https://catalogue.dataspace.copernicus.eu/odata/v1/Products"
+COPERNICUS_AUTH_HOST = "identity.dataspace.copernicus.eu"
+
+# Largest finished file offered through st.download_button
+BROWSER_DOWNLOAD_LIMIT = 200 * 1024 * 1024
+
+# Minimum seconds between progress widget updates
+PROGRESS_INTERVAL = 0.25
+
+# Products transferred at once by "Download all selected"
+MAX_CONCURRENT_DOWNLOADS = 4
+
+# Network attempts per product before giving up; each retry resumes the .part file
+DOWNLOAD_ATTEMPTS = 5
+
+# ASCII characters removed when turning a product name into a filename
+_FILENAME_DELETE = str.maketrans('', '', ''.join(
+    chr(i) for i in range(128) if chr(i) not in string.ascii_letters + string.digits + " -_."
+))
+
+def clean_filename(name: str) -> str:
+    """Keep only alphanumerics, spaces, '-', '_' and '.' in a product name"""
+    if name.isascii():
+        return name.translate(_FILENAME_DELETE).strip()
+    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+
+# Pooled HTTP session so auth and catalog calls reuse keep-alive connections;
+# idempotent requests are retried with exponential backoff on transient failures
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=5, backoff_factor=1, status_forcelist=(500, 502, 503, 504))
+))
+
+# Download URLs resolved ahead of time for the top search results; each Streamlit
+# session keeps its own map of product id -> (url, resolved at) in session_state
+PREFETCH_COUNT = 20
+# Seconds a resolved URL is trusted before going back through the catalog
+PREFETCH_TTL = 300
+_prefetch_pool = ThreadPoolExecutor(max_workers=4)
+
+def _resolve_download_url(product_id: str, token: str, resolved: dict):
+    """Record where the catalog redirects a product's download"""
+    url = f"{COPERNICUS_CATALOG_URL}({product_id})/$value"
+    response = _SESSION.get(
+        url,
+        headers={"Authorization": f"Bearer {token}"},
+        allow_redirects=False,
+        stream=True,
+        timeout=10
+    )
+    response.close()
+    if response.status_code in REDIRECT_STATUSES:
+        resolved[product_id] = (urljoin(url, response.headers["Location"]), time.monotonic())
+
+def get_prefetched_url(product_id: str):
+    """Return this session's prefetched download URL for a product, or None if missing or expired"""
+    entry = st.session_state.setdefault('prefetched', {}).get(product_id)
+    if entry is None or time.monotonic() - entry[1] > PREFETCH_TTL:
+        return None
+    return entry[0]
+
+def prefetch_download_urls(product_ids, token: str):
+    """Resolve download redirects in the background so a later download skips that hop"""
+    # The pool threads can't reach session_state, so they fill this session's dict directly
+    resolved = st.session_state.setdefault('prefetched', {})
+    for product_id in product_ids:
+        if get_prefetched_url(product_id) is None:
+            _prefetch_pool.submit(_resolve_download_url, product_id, token, resolved)
+
+# (loop, aiohttp session) pairs opened by Streamlit sessions; idle ones past
+# MAX_AIO_SESSIONS are closed, and the rest at exit
+MAX_AIO_SESSIONS = 16
+_aiohttp_sessions = AioSessionRegistry(MAX_AIO_SESSIONS)
+atexit.register(_aiohttp_sessions.close_all)
+
+def get_download_loop():
+    """Return the event loop owned by this Streamlit session"""
+    loop = st.session_state.get('download_loop')
+    # The registry closes loops it evicts, so a returning session starts a new one
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        st.session_state.download_loop = loop
+    return loop
+
+def get_aiohttp_session():
+    """Return this Streamlit session's aiohttp session, creating it on first use"""
+    loop = get_download_loop()
+    session = st.session_state.get('aiohttp_session')
+    if session is None or session.closed:
+
+        async def create_session():
+            return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=75),
+                read_bufsize=2 * CHUNK_SIZE
+            )
+
+        session = loop.run_until_complete(create_session())
+        st.session_state.aiohttp_session = session
+    _aiohttp_sessions.touch(loop, session)
+    return session
+
+@st.cache_resource(show_spinner=False)
+def _warm_dns():
+    """Resolve the identity host once per server; failures surface from the auth request"""
+    try:
+        socket.getaddrinfo(COPERNICUS_AUTH_HOST, 443)
+    except OSError:
+        pass
 
 def get_keycloak_token(username: str, password: str) -> str:
     """Get access token from Copernicus using username and password"""
@@ -22,37 +146,23 @@ def get_keycloak_token(username: str, password: str) -> str:
         "grant_type": "password",
     }
     try:
-        # Test basic internet connectivity first
-        try:
-            requests.get("https://www.google.com", timeout=5)
-        except:
-            st.error("No internet connection detected. Please check your network connection.")
-            return None
-
-        # Try to resolve the Copernicus domain
-        try:
-            requests.get("https://identity.dataspace.copernicus.eu", timeout=5)
-        except:
-            st.error("""
-                Unable to connect to Copernicus servers. This could be due to:
-                1. Network restrictions or firewall settings
-                2. DNS resolution issues
-                3. VPN requirements
-                
-                Please try:
-                1. Checking your internet connection
-                2. Using a different network
-                3. Connecting to a VPN if required
-                4. Contacting your network administrator
-            """)
-            return None
-
         # Attempt authentication
-        r = requests.post(COPERNICUS_AUTH_URL, data=data, timeout=10)
+        r = _SESSION.post(COPERNICUS_AUTH_URL, data=data, timeout=10)
         r.raise_for_status()
         return r.json()["access_token"]
     except requests.exceptions.ConnectionError:
-        st.error("Connection Error: Unable to reach Copernicus servers. Please check your internet connection.")
+        st.error("""
+            Unable to connect to Copernicus servers. This could be due to:
+            1. Network restrictions or firewall settings
+            2. DNS resolution issues
+            3. VPN requirements
+            
+            Please try:
+            1. Checking your internet connection
+            2. Using a different network
+            3. Connecting to a VPN if required
+            4. Contacting your network administrator
+        """)
         return None
     except requests.exceptions.Timeout:
         st.error("Connection Timeout: The request took too long. Please try again.")
@@ -75,27 +185,37 @@ def search_products(token: str, bbox: str, collection: str, start_date: str, end
     headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = _SESSION.get(url, params=params, headers=headers)
         response.raise_for_status()
         return response.json()
     except Exception as e:
         st.error(f"Search failed: {str(e)}")
         return None
 
+def probe_writable(directory: str):
+    """Check once per session that directory accepts new files; raises OSError if not"""
+    writable = st.session_state.setdefault('dl_dir_writable', {})
+    if writable.get(directory):
+        return
+    test_file = os.path.join(directory, ".write_test")
+    with open(test_file, "w") as f:
+        f.write("test")
+    os.remove(test_file)
+    # Only successes are cached so a fixed permission problem is picked up on retry
+    writable[directory] = True
+
 async def download_product(session, product_id: str, token: str, product_name: str, output_dir: str, progress_placeholder, status_placeholder):
     """Download a product with progress tracking"""
     try:
         # Ensure the output directory exists
-        if not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir)
-                status_placeholder.info(f"Created directory: {output_dir}")
-            except Exception as e:
-                status_placeholder.error(f"Failed to create directory: {output_dir}. Error: {str(e)}")
-                return None, False
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except Exception as e:
+            status_placeholder.error(f"Failed to create directory: {output_dir}. Error: {str(e)}")
+            return None, False
         
         # Clean the product name to ensure it's a valid filename
-        clean_name = "".join(c for c in product_name if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+        clean_name = clean_filename(product_name)
         output_path = os.path.join(output_dir, f"{clean_name}.zip")
         
         # Check if file already exists
@@ -105,109 +225,161 @@ async def download_product(session, product_id: str, token: str, product_name: s
         
         # Check write permissions on output directory
         try:
-            test_file = os.path.join(output_dir, ".write_test")
-            with open(test_file, "w") as f:
-                f.write("test")
-            os.remove(test_file)
+            probe_writable(output_dir)
         except Exception as e:
             status_placeholder.error(f"No write permission on directory: {output_dir}. Error: {str(e)}")
             return None, False
             
         headers = {"Authorization": f"Bearer {token}"}
         
-        # Get the download URL
-        url = f"{COPERNICUS_CATALOG_URL}({product_id})/$value"
+        # Get the download URL, skipping the catalog redirect if it was prefetched
+        catalog_url = f"{COPERNICUS_CATALOG_URL}({product_id})/$value"
+        url = get_prefetched_url(product_id) or catalog_url
         
-        # Follow redirects
-        async with session.get(url, headers=headers, allow_redirects=False) as response:
-            while response.status in (301, 302, 303, 307):
-                url = response.headers["Location"]
-                response = await session.get(url, headers=headers, allow_redirects=False)
-        
-        # Get file size using HEAD request
-        try:
-            async with session.head(url, headers=headers) as response:
-                total_size = int(response.headers.get('content-length', 0))
-                status_placeholder.write(f"Total size: {total_size / (1024*1024):.2f} MB")
-                
-                # Check available disk space
-                try:
-                    import shutil
-                    free_space = shutil.disk_usage(output_dir).free
-                    if free_space < total_size * 1.2:  # Add 20% buffer
-                        status_placeholder.error(f"Not enough disk space. Required: {total_size * 1.2 / (1024*1024*1024):.2f} GB, Available: {free_space / (1024*1024*1024):.2f} GB")
-                        return None, False
-                except Exception as e:
-                    status_placeholder.warning(f"Could not check disk space: {str(e)}")
-        except Exception as e:
-            # If HEAD request fails, continue anyway and get size during download
-            status_placeholder.warning(f"Couldn't determine file size in advance: {str(e)}")
-            total_size = 0  # Will be updated during download if available
-        
-        # Create a temporary file for streaming
+        # Stage into a .part file beside the output so the final publish is a same-filesystem
+        # rename; the name is deterministic so an interrupted download can be resumed
         temp_file_path = output_path + ".part"
+        total_size = 0
         
         # Stream download directly to disk to handle large files
         try:
-            # Create a BytesIO object for browser download (limited size)
-            browser_data = io.BytesIO() if total_size < 200 * 1024 * 1024 and total_size > 0 else None  # Only store in memory if < 200 MB
-            can_browser_download = browser_data is not None
-            
-            downloaded = 0
-            async with session.get(url, headers=headers) as response:
-                # If we couldn't get the size before, get it now
-                if total_size == 0:
-                    total_size = int(response.headers.get('content-length', 0))
-                    status_placeholder.write(f"Total size: {total_size / (1024*1024):.2f} MB")
-                    
-                    # Update browser_data decision based on actual size
-                    if total_size < 200 * 1024 * 1024 and total_size > 0:
-                        browser_data = io.BytesIO()
-                        can_browser_download = True
-                    else:
-                        browser_data = None
-                        can_browser_download = False
+            for attempt in range(DOWNLOAD_ATTEMPTS):
+                # Resume from whatever a previous attempt left on disk
+                resume_from = os.path.getsize(temp_file_path) if os.path.exists(temp_file_path) else 0
+                if total_size > 0 and resume_from == total_size:
+                    break
+                if total_size > 0 and resume_from > total_size:
+                    os.remove(temp_file_path)
+                    resume_from = 0
                 
-                with open(temp_file_path, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(8192):
-                        if chunk:
-                            # Write chunk to disk
-                            f.write(chunk)
-                            
-                            # Also save to BytesIO if it's not too large
-                            if can_browser_download:
-                                browser_data.write(chunk)
+                request_headers = dict(headers)
+                if resume_from > 0:
+                    request_headers["Range"] = f"bytes={resume_from}-"
+                
+                try:
+                    last_ui = time.monotonic()
+                    response = await get_following_redirects(session, url, request_headers)
+                    async with response:
+                        if response.status >= 400 and response.status != 416 and str(url) != catalog_url:
+                            # The prefetched or resolved URL has gone stale; get a fresh redirect
+                            st.session_state.prefetched.pop(product_id, None)
+                            url = catalog_url
+                            continue
+                        
+                        # Retries go straight to the resolved download URL
+                        url = response.url
+                        
+                        if response.status == 416 and resume_from > 0:
+                            # Nothing left past the partial file: it is either complete or stale
+                            if response.headers.get('Content-Range', '').rpartition('/')[2] == str(resume_from):
+                                total_size = resume_from
+                                break
+                            os.remove(temp_file_path)
+                            continue
+                        
+                        response.raise_for_status()
+                        content_range = response.headers.get('Content-Range', '')
+                        if response.status == 206 and not content_range.startswith(f"bytes {resume_from}-"):
+                            # A range other than the one asked for can't be appended to the
+                            # .part file; drop it and fetch the whole product on the next attempt
+                            if os.path.exists(temp_file_path):
+                                os.remove(temp_file_path)
+                            continue
+                        if resume_from > 0 and response.status == 206:
+                            mode = 'ab'
+                            downloaded = resume_from
+                            status_placeholder.info(f"Resuming download at {resume_from / (1024*1024):.2f} MB")
+                        else:
+                            # No partial file, or the server ignored the Range header
+                            mode = 'wb'
+                            downloaded = 0
+                        
+                        # Take the size from the streaming response instead of a separate HEAD
+                        full_size = content_range.rpartition('/')[2]
+                        if response.status == 206 and full_size.isdigit():
+                            total_size = int(full_size)
+                        else:
+                            total_size = downloaded + int(response.headers.get('content-length', 0))
+                        status_placeholder.write(f"Total size: {total_size / (1024*1024):.2f} MB")
+                        
+                        # Check available disk space for the bytes still to come
+                        try:
+                            required = (total_size - downloaded) * 1.2  # Add 20% buffer
+                            free_space = shutil.disk_usage(output_dir).free
+                            if free_space < required:
+                                status_placeholder.error(f"Not enough disk space. Required: {required / (1024*1024*1024):.2f} GB, Available: {free_space / (1024*1024*1024):.2f} GB")
+                                return None, False
+                        except Exception as e:
+                            status_placeholder.warning(f"Could not check disk space: {str(e)}")
+                        
+                        # Disk writes run in aiofiles' thread pool so they don't stall the event loop;
+                        # chunks are already large, so skip Python's write buffer
+                        async with aiofiles.open(temp_file_path, mode, buffering=0) as f:
+                            # Reserve the whole product up front for contiguous extents and
+                            # to fail before transferring anything if the disk is full
+                            try:
+                                preallocate(f.fileno(), total_size)
+                            except OSError as e:
+                                if e.errno == errno.ENOSPC:
+                                    status_placeholder.error("Insufficient disk space")
+                                    return None, False
+                                raise
                             
-                            downloaded += len(chunk)
-                            progress = (downloaded / total_size) * 100 if total_size > 0 else 0
+                            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                                if chunk:
+                                    # Write chunk to disk, handling short writes on the raw file
+                                    view = memoryview(chunk)
+                                    while view:
+                                        view = view[await f.write(view):]
+                                    
+                                    downloaded += len(chunk)
+                                    progress = (downloaded / total_size) * 100 if total_size > 0 else 0
+                                    
+                                    # Update progress on a fixed cadence to reduce UI load
+                                    now = time.monotonic()
+                                    if now - last_ui > PROGRESS_INTERVAL or downloaded == total_size:
+                                        last_ui = now
+                                        progress_placeholder.progress(progress / 100)
+                                        status_placeholder.write(
+                                            f"Downloading: {downloaded / (1024*1024):.2f} MB / "
+                                            f"{total_size / (1024*1024):.2f} MB ({progress:.1f}%)"
+                                        )
                             
-                            # Update progress less frequently to reduce UI load
-                            if int(progress) % 2 == 0 or downloaded == total_size:
-                                progress_placeholder.progress(progress / 100)
-                                status_placeholder.write(
-                                    f"Downloading: {downloaded / (1024*1024):.2f} MB / "
-                                    f"{total_size / (1024*1024):.2f} MB ({progress:.1f}%)"
-                                )
+                            # Don't let a multi-GB product evict hotter pages from the page cache
+                            if hasattr(os, "posix_fadvise"):
+                                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                        
+                        if total_size > 0 and downloaded < total_size:
+                            # Retried like any other dropped connection, resuming from the .part file
+                            raise aiohttp.ClientPayloadError(
+                                f"Connection closed after {downloaded} of {total_size} bytes"
+                            )
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    client_error = isinstance(e, aiohttp.ClientResponseError) and e.status < 500
+                    if client_error or attempt == DOWNLOAD_ATTEMPTS - 1:
+                        raise
+                    status_placeholder.warning(f"Connection interrupted ({str(e)}), retrying...")
+                    # Exponential backoff with jitter so parallel downloads don't retry in lockstep
+                    await asyncio.sleep(min(2 ** attempt, 30) + random.uniform(0, 1))
+            else:
+                raise RuntimeError(f"Download did not complete after {DOWNLOAD_ATTEMPTS} attempts")
             
-            # Rename temp file to final file
-            os.rename(temp_file_path, output_path)
+            # Never publish a truncated or oversized .part as the product
+            final_size = os.path.getsize(temp_file_path)
+            if total_size > 0 and final_size != total_size:
+                raise RuntimeError(f"Downloaded {final_size} of {total_size} bytes")
             
-            # Prepare browser download if available
-            if can_browser_download:
-                browser_data.seek(0)
+            # Publish the finished file atomically (os.replace also overwrites on Windows)
+            os.replace(temp_file_path, output_path)
             
             status_placeholder.success(f"Download complete! File saved to: {output_path}")
             
-            # Return both the file path and the BytesIO object (or None if too large for browser download)
-            return (output_path, browser_data), False
+            # The browser copy is read from disk on demand, so only the path is returned
+            return output_path, False
         
         except Exception as e:
-            # Clean up temp file if download failed
-            if os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                except:
-                    pass
+            # Keep the partial file so the next attempt can resume from it
             status_placeholder.error(f"Error downloading file: {str(e)}")
             return None, False
             
@@ -215,9 +387,47 @@ async def download_product(session, product_id: str, token: str, product_name: s
         status_placeholder.error(f"Download failed: {str(e)}")
         return None, False
 
+async def download_products(session, products, token: str, output_dir: str, placeholders):
+    """Download several products concurrently, at most MAX_CONCURRENT_DOWNLOADS at a time"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+    async def bounded_download(product, progress_placeholder, status_placeholder):
+        async with semaphore:
+            return await download_product(
+                session,
+                product['Id'],
+                token,
+                product['Name'],
+                output_dir,
+                progress_placeholder,
+                status_placeholder
+            )
+
+    return await asyncio.gather(*[
+        bounded_download(product, progress_placeholder, status_placeholder)
+        for product, (progress_placeholder, status_placeholder) in zip(products, placeholders)
+    ])
+
+def _results_to_gdf(results: list, collection: str):
+    """Build the search results GeoDataFrame; called once per search, not per rerun"""
+    df = pd.DataFrame.from_dict(results)
+    if 'GeoFootprint' not in df.columns:
+        return None
+
+    # Parse all footprints in one vectorized GEOS call
+    df['geometry'] = shapely.from_geojson(
+        np.array([json.dumps(footprint) for footprint in df['GeoFootprint']], dtype=object)
+    )
+    gdf = gpd.GeoDataFrame(df).set_geometry('geometry')
+
+    if collection == "SENTINEL-2":
+        gdf = gdf[~gdf['Name'].str.contains('L1C', regex=False, na=False)]
+    return gdf
+
 def render_copernicus_interface():
     """Render the complete Copernicus Hub interface"""
     st.title("Copernicus Hub")
+    _warm_dns()
     
     # Create two columns for main content and sidebar with adjusted widths
     main_col, sidebar_col = st.columns([2, 1])
@@ -262,14 +472,14 @@ def render_copernicus_interface():
             max_lon = st.number_input("Max Longitude", value=-73.5, format="%.4f", key="max_lon")
         
         # Generate bounding box
-        bbox = f"POLYGON(({min_lon} {min_lat}, {min_lon} {max_lat}, {max_lon} {max_lat}, {max_lon} {min_lat}, {min_lon} {min_lat}))"
+        bbox = bbox_wkt(min_lon, min_lat, max_lon, max_lat)
         
         # Show current bounding box
         st.markdown("### Current Bounding Box")
         st.code(bbox, language="text")
 
-        if 'search_results' not in st.session_state:
-            st.session_state.search_results = None
+        if 'search_gdf' not in st.session_state:
+            st.session_state.search_gdf = None
         if 'token' not in st.session_state:
             st.session_state.token = None
 
@@ -300,98 +510,140 @@ def render_copernicus_interface():
                     st.error("No products found matching your criteria")
                     st.stop()
 
-                st.session_state.search_results = results['value']
-                st.success(f"Found {len(st.session_state.search_results)} products")
+                # Build the frame once, for the collection that was actually searched,
+                # so reruns neither rebuild nor re-hash the results
+                st.session_state.search_gdf = _results_to_gdf(results['value'], collection)
+                st.success(f"Found {len(results['value'])} products")
+                prefetch_download_urls([p['Id'] for p in results['value'][:PREFETCH_COUNT]], token)
 
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
-        if st.session_state.search_results:
-            df = pd.DataFrame.from_dict(st.session_state.search_results)
+        gdf = st.session_state.search_gdf
+        if gdf is not None:
+            # Batch download of several products at once
+            product_names = dict(zip(gdf['Id'], gdf['Name']))
+            selected_ids = st.multiselect(
+                "Select products to download",
+                options=list(product_names),
+                format_func=lambda product_id: product_names[product_id],
+                key="batch_download_ids"
+            )
+            if st.button("Download all selected", disabled=not selected_ids):
+                selected = [row for _, row in gdf[gdf['Id'].isin(selected_ids)].iterrows()]
+                placeholders = []
+                for row in selected:
+                    st.caption(row['Name'])
+                    placeholders.append((st.empty(), st.empty()))
 
-            if 'GeoFootprint' in df.columns:
-                df['geometry'] = df['GeoFootprint'].apply(shape)
-                gdf = gpd.GeoDataFrame(df).set_geometry('geometry')
+                results = get_download_loop().run_until_complete(download_products(
+                    get_aiohttp_session(),
+                    selected,
+                    st.session_state.token,
+                    st.session_state.download_dir,
+                    placeholders
+                ))
 
-                if collection == "SENTINEL-2":
-                    gdf = gdf[~gdf['Name'].str.contains('L1C')]
+                for row, (result, file_exists) in zip(selected, results):
+                    if result and not file_exists:
+                        st.session_state[f"download_{row['Id']}"] = {
+                            'started': True,
+                            'completed': True,
+                            'file_path': result,
+                            'file_name': os.path.basename(result)
+                        }
 
-                tabs = st.tabs([f"Product {i+1}" for i in range(len(gdf))])
+            # One table row per product; details and download controls are
+            # rendered only for the selected row
+            table_columns = [c for c in ('Name', 'Id', 'ContentLength') if c in gdf.columns]
+            event = st.dataframe(
+                gdf[table_columns],
+                on_select="rerun",
+                selection_mode="single-row",
+                hide_index=True,
+                key="product_table"
+            )
 
-                for i, tab in enumerate(tabs):
-                    with tab:
-                        row = gdf.iloc[i]
-                        st.subheader(row['Name'])
+            if event.selection.rows:
+                row = gdf.iloc[event.selection.rows[0]]
+                st.subheader(row['Name'])
 
-                        st.json({
-                            'ID': row['Id'],
-                            'Size': f"{row.get('ContentLength', 0) / (1024*1024):.2f} MB",
-                            'Date': row.get('ContentDate', {}).get('Start'),
-                            'Cloud Cover': row.get('CloudCover', 'N/A')
-                        })
-                        
-                        # Store download status in session state
-                        download_key = f"download_{row['Id']}"
-                        if download_key not in st.session_state:
-                            st.session_state[download_key] = {
-                                'started': False,
-                                'completed': False,
-                                'file_data': None,
-                                'file_name': None
-                            }
-
-                        # Form for initiating download
-                        with st.form(key=f"download_form_{row['Id']}"):
-                            # Use the selected download directory from session state
-                            downloads_dir = st.session_state.download_dir
-                            
-                            # Display the current download location
-                            st.info(f"Files will be downloaded to: {downloads_dir}")
-                            
-                            download_submitted = st.form_submit_button("Start Download")
+                st.json({
+                    'ID': row['Id'],
+                    'Size': f"{row.get('ContentLength', 0) / (1024*1024):.2f} MB",
+                    'Date': row.get('ContentDate', {}).get('Start'),
+                    'Cloud Cover': row.get('CloudCover', 'N/A')
+                })
+                
+                # Store download status in session state
+                download_key = f"download_{row['Id']}"
+                if download_key not in st.session_state:
+                    st.session_state[download_key] = {
+                        'started': False,
+                        'completed': False,
+                        'file_path': None,
+                        'file_name': None
+                    }
 
-                        # Handle download process outside the form
-                        download_state = st.session_state[download_key]
-                        
-                        if download_submitted:
-                            download_state['started'] = True
-                            progress_placeholder = st.empty()
-                            status_placeholder = st.empty()
-                            
-                            # Define the async function outside
-                            async def perform_download():
-                                async with aiohttp.ClientSession() as session:
-                                    result, file_exists = await download_product(
-                                        session,
-                                        row['Id'],
-                                        st.session_state.token,
-                                        row['Name'],
-                                        downloads_dir,
-                                        progress_placeholder,
-                                        status_placeholder
-                                    )
-                                    
-                                    # Store result in session state for later use
-                                    if result and not file_exists:
-                                        output_path, file_data = result
-                                        file_name = os.path.basename(output_path)
-                                        download_state['completed'] = True
-                                        download_state['file_data'] = file_data
-                                        download_state['file_name'] = file_name
-                            
-                            # Run the async function
-                            asyncio.run(perform_download())
+                # Form for initiating download
+                with st.form(key=f"download_form_{row['Id']}"):
+                    # Use the selected download directory from session state
+                    downloads_dir = st.session_state.download_dir
+                    
+                    # Display the current download location
+                    st.info(f"Files will be downloaded to: {downloads_dir}")
+                    
+                    download_submitted = st.form_submit_button("Start Download")
+
+                # Handle download process outside the form
+                download_state = st.session_state[download_key]
+                
+                if download_submitted:
+                    download_state['started'] = True
+                    progress_placeholder = st.empty()
+                    status_placeholder = st.empty()
+                    
+                    # Define the async function outside
+                    session = get_aiohttp_session()
+
+                    async def perform_download():
+                        result, file_exists = await download_product(
+                            session,
+                            row['Id'],
+                            st.session_state.token,
+                            row['Name'],
+                            downloads_dir,
+                            progress_placeholder,
+                            status_placeholder
+                        )
                         
-                        # Display download button outside the form if download is complete
-                        if download_state['completed'] and download_state['file_data'] is not None:
-                            st.success("Download complete! You can now save the file to your browser.")
-                            st.download_button(
-                                label="Download to browser",
-                                data=download_state['file_data'],
-                                file_name=download_state['file_name'],
-                                mime="application/zip",
-                                key=f"browser_download_{row['Id']}"
-                            )
-                        elif download_state['completed'] and download_state['file_data'] is None:
-                            st.success("Download complete! File was saved to your local disk.")
-                            st.info(f"The file was too large to enable browser download. Please check the download directory: {downloads_dir}")
+                        # Store result in session state for later use
+                        if result and not file_exists:
+                            download_state['completed'] = True
+                            download_state['file_path'] = result
+                            download_state['file_name'] = os.path.basename(result)
+                    
+                    # Run on the session's loop so the pooled connector is reused
+                    get_download_loop().run_until_complete(perform_download())
+                
+                # Display download button outside the form if download is complete
+                file_path = download_state['file_path']
+                browser_download = (
+                    download_state['completed']
+                    and file_path is not None
+                    and os.path.exists(file_path)
+                    and os.path.getsize(file_path) < BROWSER_DOWNLOAD_LIMIT
+                )
+                if browser_download:
+                    st.success("Download complete! You can now save the file to your browser.")
+                    with open(file_path, 'rb') as f:
+                        st.download_button(
+                            label="Download to browser",
+                            data=f,
+                            file_name=download_state['file_name'],
+                            mime="application/zip",
+                            key=f"browser_download_{row['Id']}"
+                        )
+                elif download_state['completed']:
+                    st.success("Download complete! File was saved to your local disk.")
+                    st.info(f"The file was too large to enable browser download. Please check the download directory: {downloads_dir}")
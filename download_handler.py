@@ -1,42 +1,48 @@
 import os
 import sys
 import requests
-import queue
-import threading
+from requests.adapters import HTTPAdapter
+from download_utils import CHUNK_SIZE, stream_following_redirects
 import json
+import time
 
-def download_worker(product_id, token, product_name, output_dir, progress_queue):
-    """Worker function to handle download in a separate process"""
+# Minimum seconds between progress events
+PROGRESS_INTERVAL = 0.25
+
+# Shared session so redirect hops and retries reuse pooled TLS connections
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_maxsize=8))
+
+def stream_download(product_id, token, product_name, output_dir):
+    """Download a product, yielding progress events as it goes"""
     try:
         output_path = os.path.join(output_dir, f"{product_name}.zip")
-        session = requests.Session()
-        session.headers.update({"Authorization": f"Bearer {token}"})
+        headers = {"Authorization": f"Bearer {token}"}
         
         url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
         
-        # Follow redirects
-        response = session.get(url, allow_redirects=False)
-        while response.status_code in (301, 302, 303, 307):
-            url = response.headers["Location"]
-            response = session.get(url, allow_redirects=False)
-        
-        # Get file size
-        file_response = session.get(url, stream=True, verify=False)
+        # Follow redirects and stream the final response
+        file_response = stream_following_redirects(SESSION, url, headers)
+        file_response.raise_for_status()
         total_size = int(file_response.headers.get('content-length', 0))
         
         # Download with progress
         downloaded = 0
+        last_update = time.monotonic()
         with open(output_path, "wb") as f:
-            for chunk in file_response.iter_content(chunk_size=8192):
+            for chunk in file_response.iter_content(chunk_size=CHUNK_SIZE):
                 if chunk:
                     f.write(chunk)
                     downloaded += len(chunk)
-                    progress = (downloaded / total_size) * 100 if total_size > 0 else 0
-                    progress_queue.put(('progress', progress, downloaded, total_size))
+                    now = time.monotonic()
+                    if now - last_update > PROGRESS_INTERVAL or downloaded == total_size:
+                        last_update = now
+                        progress = (downloaded / total_size) * 100 if total_size > 0 else 0
+                        yield ('progress', progress, downloaded, total_size)
         
-        progress_queue.put(('complete', output_path))
+        yield ('complete', output_path)
     except Exception as e:
-        progress_queue.put(('error', str(e)))
+        yield ('error', str(e))
 
 def main():
     if len(sys.argv) != 5:
@@ -48,44 +54,28 @@ def main():
     product_name = sys.argv[3]
     output_dir = sys.argv[4]
     
-    # Create progress queue
-    progress_queue = queue.Queue()
-    
-    # Start download in a separate thread
-    thread = threading.Thread(
-        target=download_worker,
-        args=(product_id, token, product_name, output_dir, progress_queue)
-    )
-    thread.start()
-    
-    # Monitor progress and print updates
-    while True:
-        try:
-            status, *args = progress_queue.get(timeout=1)
-            if status == 'progress':
-                progress, downloaded, total_size = args
-                print(json.dumps({
-                    'status': 'progress',
-                    'progress': progress,
-                    'downloaded': downloaded,
-                    'total_size': total_size
-                }))
-            elif status == 'complete':
-                output_path = args[0]
-                print(json.dumps({
-                    'status': 'complete',
-                    'path': output_path
-                }))
-                break
-            elif status == 'error':
-                error_msg = args[0]
-                print(json.dumps({
-                    'status': 'error',
-                    'error': error_msg
-                }))
-                break
-        except queue.Empty:
-            continue
+    # Print progress updates as the download produces them
+    for status, *args in stream_download(product_id, token, product_name, output_dir):
+        if status == 'progress':
+            progress, downloaded, total_size = args
+            print(json.dumps({
+                'status': 'progress',
+                'progress': progress,
+                'downloaded': downloaded,
+                'total_size': total_size
+            }), flush=True)
+        elif status == 'complete':
+            output_path = args[0]
+            print(json.dumps({
+                'status': 'complete',
+                'path': output_path
+            }), flush=True)
+        elif status == 'error':
+            error_msg = args[0]
+            print(json.dumps({
+                'status': 'error',
+                'error': error_msg
+            }), flush=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
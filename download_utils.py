@@ -0,0 +1,102 @@
+import ctypes
+import errno
+import os
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import urljoin
+from yarl import URL
+
+# Stream downloads in 1 MiB pieces to keep per-chunk Python overhead low
+CHUNK_SIZE = 1 << 20
+
+# Statuses that carry a Location to follow
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# fallocate(2) flag that reserves blocks without changing the file size, so a
+# partial .part file still reports how much has been downloaded
+FALLOC_FL_KEEP_SIZE = 0x01
+_libc = ctypes.CDLL(None, use_errno=True) if sys.platform.startswith("linux") else None
+_fallocate = getattr(_libc, "fallocate64", None) or getattr(_libc, "fallocate", None)
+if _fallocate is not None:
+    _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+
+def preallocate(fd: int, size: int):
+    """Reserve disk space for a download up front, raising OSError(ENOSPC) if it won't fit"""
+    if _fallocate is None or size <= 0:
+        return
+    if _fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) != 0:
+        err = ctypes.get_errno()
+        # Other failures (e.g. unsupported filesystem) just skip preallocation
+        if err == errno.ENOSPC:
+            raise OSError(err, os.strerror(err))
+
+async def get_following_redirects(session, url, headers):
+    """GET url on an aiohttp session, following redirects by hand so the Authorization header survives host changes"""
+    while True:
+        response = await session.get(url, headers=headers, allow_redirects=False)
+        if response.status not in REDIRECT_STATUSES:
+            return response
+        url = response.url.join(URL(response.headers["Location"]))
+        response.release()
+
+def stream_following_redirects(session, url, headers):
+    """Streaming GET of url on a requests session, following redirects by hand like get_following_redirects"""
+    while True:
+        response = session.get(url, headers=headers, stream=True, allow_redirects=False)
+        if response.status_code not in REDIRECT_STATUSES:
+            return response
+        url = urljoin(url, response.headers["Location"])
+        response.close()
+
+def _close_aio_pair(loop, session):
+    """Close an aiohttp session and the idle loop it is bound to"""
+    if loop.is_closed() or loop.is_running():
+        return
+    try:
+        if not session.closed:
+            loop.run_until_complete(session.close())
+        loop.close()
+    except RuntimeError:
+        # The owner started the loop in the meantime; leave the pair to it
+        pass
+
+class AioSessionRegistry:
+    """(event loop, aiohttp session) pairs owned by Streamlit sessions, least recently used first
+
+    A browser session that goes away never runs its loop again, so its keep-alive
+    sockets and selector fds would live as long as the server. Past limit pairs the
+    least recently used one is closed; an owner that comes back finds its loop and
+    session closed and opens new ones.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._pairs = OrderedDict()  # loop -> session
+        self._lock = threading.Lock()
+
+    def touch(self, loop, session):
+        """Mark a pair as just used, closing pairs that are already closed or past the limit"""
+        evicted = []
+        with self._lock:
+            stale = [l for l, s in self._pairs.items() if l is not loop and (l.is_closed() or s.closed)]
+            for old_loop in stale:
+                evicted.append((old_loop, self._pairs.pop(old_loop)))
+            self._pairs[loop] = session
+            self._pairs.move_to_end(loop)
+            while len(self._pairs) > self.limit:
+                old_loop, old_session = self._pairs.popitem(last=False)
+                if old_loop.is_running():
+                    # Mid-download on another thread; keep it and retry on a later touch
+                    self._pairs[old_loop] = old_session
+                    break
+                evicted.append((old_loop, old_session))
+        for old_loop, old_session in evicted:
+            _close_aio_pair(old_loop, old_session)
+
+    def close_all(self):
+        """Close every remaining pair; registered with atexit by the scripts"""
+        with self._lock:
+            pairs, self._pairs = list(self._pairs.items()), OrderedDict()
+        for loop, session in pairs:
+            _close_aio_pair(loop, session)
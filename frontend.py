@@ -1,41 +1,129 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import json
+import orjson
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import shape
+import numpy as np
+import shapely
 from datetime import date, timedelta
 import folium
 from streamlit_folium import st_folium
 import time
+import math
+import atexit
 import asyncio
 import aiohttp
+import aiofiles
+from download_utils import CHUNK_SIZE, AioSessionRegistry, get_following_redirects
+from utils import bbox_wkt
 import io
 
+# Run download coroutines on uvloop when it is available (not on Windows); only
+# the loops this script creates use it, the server's own loop policy is untouched
+try:
+    import uvloop
+    _new_event_loop = uvloop.new_event_loop
+except ImportError:
+    _new_event_loop = asyncio.new_event_loop
+
 # Copernicus API endpoints
 COPERNICUS_AUTH_URL = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
 COPERNICUS_CATALOG_URL = "https://catalogue.dataspace.copernicus.eu/odata/v1/Products"
 
-def get_keycloak_token(username: str, password: str) -> str:
-    """Get access token from Copernicus using username and password"""
+# Default area of interest as (min_lat, min_lon, max_lat, max_lon)
+DEFAULT_BOUNDS = (40.4, -74.3, 41.0, -73.5)
+
+# Access tokens live 10 minutes on CDSE; reuse them for 9
+TOKEN_TTL = 540
+
+# Seconds an identical catalog search is served from cache
+SEARCH_TTL = 5 * 60
+
+# Download loops kept open across all browser sessions; beyond this the least
+# recently used one is closed
+MAX_AIO_SESSIONS = 16
+
+# Minimum seconds between progress widget updates
+PROGRESS_INTERVAL = 0.2
+
+# Downloaded chunks buffered between the network reader and the disk writer
+WRITE_QUEUE_SIZE = 8
+
+# Products shown per page of result tabs
+PAGE_SIZE = 20
+
+# Products transferred at once by "Download selected"
+MAX_CONCURRENT_DOWNLOADS = 5
+
+@st.cache_resource
+def get_session():
+    """Shared keep-alive session for auth and catalog requests"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+# aiohttp sessions are bound to the loop that created them, so each Streamlit
+# session keeps one loop and one pooled session for all of its downloads
+@st.cache_resource
+def _aio_sessions():
+    """Process-wide registry of every session's loop and aiohttp session"""
+    registry = AioSessionRegistry(MAX_AIO_SESSIONS)
+    # Registered here rather than at module level, which reruns on every script run
+    atexit.register(registry.close_all)
+    return registry
+
+def get_download_loop():
+    """Return the event loop owned by this Streamlit session"""
+    loop = st.session_state.get('download_loop')
+    # The registry closes loops it evicts, so a returning session starts a new one
+    if loop is None or loop.is_closed():
+        loop = _new_event_loop()
+        st.session_state.download_loop = loop
+    return loop
+
+def get_aio_session():
+    """Return this Streamlit session's aiohttp session, creating it on first use"""
+    loop = get_download_loop()
+    session = st.session_state.get('aio_session')
+    if session is None or session.closed:
+
+        async def create_session():
+            return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60, ttl_dns_cache=300)
+            )
+
+        session = loop.run_until_complete(create_session())
+        st.session_state.aio_session = session
+    _aio_sessions().touch(loop, session)
+    return session
+
+@st.cache_data(ttl=TOKEN_TTL, show_spinner=False)
+def _fetch_token(username: str, password: str) -> str:
+    """Request an access token; failures raise so they are never cached"""
     data = {
         "client_id": "cdse-public",
         "username": username,
         "password": password,
         "grant_type": "password",
     }
+    r = get_session().post(COPERNICUS_AUTH_URL, data=data)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+def get_keycloak_token(username: str, password: str) -> str:
+    """Get access token from Copernicus using username and password"""
     try:
-        r = requests.post(COPERNICUS_AUTH_URL, data=data)
-        r.raise_for_status()
-        return r.json()["access_token"]
+        return _fetch_token(username, password)
     except Exception as e:
         st.error(f"Authentication failed: {str(e)}")
         return None
 
-def search_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000):
-    """Search for products in the Copernicus catalog"""
-    url = COPERNICUS_CATALOG_URL
+@st.cache_data(ttl=SEARCH_TTL, show_spinner=False)
+def _fetch_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int):
+    """Query the catalog; failures raise so they are never cached"""
     params = {
         "$filter": f"Collection/Name eq '{collection}' and OData.CSC.Intersects(area=geography'SRID=4326;{bbox}') and ContentDate/Start gt {start_date}T00:00:00.000Z and ContentDate/Start lt {end_date}T23:59:59.999Z",
         "$count": "True",
@@ -43,19 +131,39 @@ def search_products(token: str, bbox: str, collection: str, start_date: str, end
     }
     headers = {"Authorization": f"Bearer {token}"}
     
+    response = get_session().get(COPERNICUS_CATALOG_URL, params=params, headers=headers)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+def search_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000):
+    """Search for products in the Copernicus catalog"""
     try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return _fetch_products(token, bbox, collection, start_date, end_date, result_limit)
     except Exception as e:
         st.error(f"Search failed: {str(e)}")
         return None
 
+async def write_worker(f, queue, failed):
+    """Write queued chunks to f until a None sentinel, draining the queue even after an error"""
+    error = None
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            break
+        if error is None:
+            try:
+                await f.write(chunk)
+            except OSError as e:
+                error = e
+                failed.set()
+    if error is not None:
+        raise error
+
 async def download_product(session, product_id: str, token: str, product_name: str, output_dir: str, progress_placeholder, status_placeholder):
     """Download a product with progress tracking"""
     try:
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        # Directory creation can block on slow or network filesystems
+        await asyncio.to_thread(os.makedirs, output_dir, exist_ok=True)
         
         output_path = os.path.join(output_dir, f"{product_name}.zip")
         headers = {"Authorization": f"Bearer {token}"}
@@ -63,30 +171,46 @@ async def download_product(session, product_id: str, token: str, product_name: s
         # Get the download URL
         url = f"{COPERNICUS_CATALOG_URL}({product_id})/$value"
         
-        # Follow redirects
-        async with session.get(url, headers=headers, allow_redirects=False) as response:
-            while response.status in (301, 302, 303, 307):
-                url = response.headers["Location"]
-                response = await session.get(url, headers=headers, allow_redirects=False)
-        
-        # Get file size
-        async with session.get(url, headers=headers) as response:
+        # One streaming GET: redirects are followed by hand so the
+        # Authorization header survives the hop to the download host
+        response = await get_following_redirects(session, url, headers)
+        async with response:
+            response.raise_for_status()
             total_size = int(response.headers.get('content-length', 0))
             status_placeholder.write(f"Total size: {total_size / (1024*1024):.2f} MB")
             
             # Download with progress
             downloaded = 0
-            with open(output_path, "wb") as f:
-                async for chunk in response.content.iter_chunked(8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        progress = (downloaded / total_size) * 100 if total_size > 0 else 0
-                        progress_placeholder.progress(progress / 100)
-                        status_placeholder.write(
-                            f"Downloading: {downloaded / (1024*1024):.2f} MB / "
-                            f"{total_size / (1024*1024):.2f} MB ({progress:.1f}%)"
-                        )
+            last_pct = -1
+            last_ui = time.monotonic()
+            # Network reads and disk writes overlap: chunks are queued for a
+            # separate writer task instead of being written on the read path
+            queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+            write_failed = asyncio.Event()
+            async with aiofiles.open(output_path, "wb") as f:
+                writer = asyncio.create_task(write_worker(f, queue, write_failed))
+                try:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        if write_failed.is_set():
+                            break
+                        if chunk:
+                            await queue.put(chunk)
+                            downloaded += len(chunk)
+                            progress = (downloaded / total_size) * 100 if total_size > 0 else 0
+                            
+                            # Redraw only when the percentage moves, at most every PROGRESS_INTERVAL
+                            now = time.monotonic()
+                            if (int(progress) != last_pct and now - last_ui > PROGRESS_INTERVAL) or downloaded == total_size:
+                                last_pct = int(progress)
+                                last_ui = now
+                                progress_placeholder.progress(progress / 100)
+                                status_placeholder.write(
+                                    f"Downloading: {downloaded / (1024*1024):.2f} MB / "
+                                    f"{total_size / (1024*1024):.2f} MB ({progress:.1f}%)"
+                                )
+                finally:
+                    await queue.put(None)
+                    await writer
             
             status_placeholder.success(f"Download complete! File saved to: {output_path}")
             return output_path
@@ -95,10 +219,35 @@ async def download_product(session, product_id: str, token: str, product_name: s
         status_placeholder.error(f"Download failed: {str(e)}")
         return None
 
-def create_map(center_lat=40.7, center_lon=-73.9, zoom=10):
+async def download_products(session, products, token: str, output_dir: str, placeholders):
+    """Download several products concurrently, at most MAX_CONCURRENT_DOWNLOADS at a time"""
+    # Created per call: a semaphore is tied to the event loop it first waits on
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+    async def bounded_download(product, progress_placeholder, status_placeholder):
+        async with semaphore:
+            return await download_product(
+                session,
+                product['Id'],
+                token,
+                product['Name'],
+                output_dir,
+                progress_placeholder,
+                status_placeholder
+            )
+
+    return await asyncio.gather(*[
+        bounded_download(product, progress_placeholder, status_placeholder)
+        for product, (progress_placeholder, status_placeholder) in zip(products, placeholders)
+    ])
+
+@st.cache_resource
+def create_map(center_lat=40.7, center_lon=-73.9, zoom=10, bounds=DEFAULT_BOUNDS):
+    """Build the area-of-interest map; cached so reruns with the same bounds reuse it"""
+    min_lat, min_lon, max_lat, max_lon = bounds
     m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
     folium.Rectangle(
-        bounds=[[40.4, -74.3], [41.0, -73.5]],
+        bounds=[[min_lat, min_lon], [max_lat, max_lon]],
         color='#ff7800',
         fill=True,
         fill_color='#ffff00',
@@ -174,7 +323,7 @@ def main():
         bbox = f"POLYGON(({bounds[0][0]} {bounds[0][1]}, {bounds[1][0]} {bounds[1][1]}, {bounds[2][0]} {bounds[2][1]}, {bounds[3][0]} {bounds[3][1]}, {bounds[0][0]} {bounds[0][1]}))"
     else:
         # Use manual input coordinates
-        bbox = f"POLYGON(({min_lon} {min_lat}, {min_lon} {max_lat}, {max_lon} {max_lat}, {max_lon} {min_lat}, {min_lon} {min_lat}))"
+        bbox = bbox_wkt(min_lon, min_lat, max_lon, max_lat)
     
     # Show current bounding box
     st.markdown("### Current Bounding Box")
@@ -222,17 +371,55 @@ def main():
         df = pd.DataFrame.from_dict(st.session_state.search_results)
 
         if 'GeoFootprint' in df.columns:
-            df['geometry'] = df['GeoFootprint'].apply(shape)
-            gdf = gpd.GeoDataFrame(df).set_geometry('geometry')
+            # Parse all footprints in one vectorized GEOS call
+            geometries = shapely.from_geojson(
+                np.array([orjson.dumps(footprint) for footprint in df['GeoFootprint']], dtype=object)
+            )
+            gdf = gpd.GeoDataFrame(df, geometry=geometries, crs="EPSG:4326")
 
             if collection == "SENTINEL-2":
-                gdf = gdf[~gdf['Name'].str.contains('L1C')]
+                gdf = gdf[~gdf['Name'].str.contains('L1C', regex=False, na=False)]
 
-            tabs = st.tabs([f"Product {i+1}" for i in range(len(gdf))])
+            # Batch download of several products at once
+            product_names = dict(zip(gdf['Id'], gdf['Name']))
+            selected_ids = st.multiselect(
+                "Download selected",
+                options=list(product_names),
+                format_func=lambda product_id: product_names[product_id],
+                key="batch_download_ids"
+            )
+            if selected_ids:
+                batch_dir = st.text_input(
+                    "Select download directory",
+                    value=os.path.join(os.getcwd(), "downloads"),
+                    key="batch_dir"
+                )
+                if st.button("Download selected products"):
+                    selected = [row for _, row in gdf[gdf['Id'].isin(selected_ids)].iterrows()]
+                    placeholders = []
+                    for row in selected:
+                        st.caption(row['Name'])
+                        placeholders.append((st.empty(), st.empty()))
+
+                    get_download_loop().run_until_complete(download_products(
+                        get_aio_session(),
+                        selected,
+                        st.session_state.token,
+                        batch_dir,
+                        placeholders
+                    ))
+
+            # Only the current page of products gets tabs and forms
+            page_count = max(1, math.ceil(len(gdf) / PAGE_SIZE))
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key="results_page")
+            offset = (page - 1) * PAGE_SIZE
+            view = gdf.iloc[offset:offset + PAGE_SIZE]
+
+            tabs = st.tabs([f"Product {offset + i + 1}" for i in range(len(view))])
 
             for i, tab in enumerate(tabs):
                 with tab:
-                    row = gdf.iloc[i]
+                    row = view.iloc[i]
                     st.subheader(row['Name'])
 
                     st.json({
@@ -254,19 +441,15 @@ def main():
                             progress_placeholder = st.empty()
                             status_placeholder = st.empty()
                             
-                            async def download():
-                                async with aiohttp.ClientSession() as session:
-                                    await download_product(
-                                        session,
-                                        row['Id'],
-                                        st.session_state.token,
-                                        row['Name'],
-                                        output_dir,
-                                        progress_placeholder,
-                                        status_placeholder
-                                    )
-                            
-                            asyncio.run(download())
+                            get_download_loop().run_until_complete(download_product(
+                                get_aio_session(),
+                                row['Id'],
+                                st.session_state.token,
+                                row['Name'],
+                                output_dir,
+                                progress_placeholder,
+                                status_placeholder
+                            ))
 
 if __name__ == "__main__":
     main()
@@ -1,48 +1,35 @@
-import requests
-import json
-from geopy.distance import geodesic  # Import geodesic for distance calculation
+import asyncio
+import aiohttp
+import orjson
 import math  # Import math for trigonometric functions
-from shapely.geometry import Point, Polygon  # Import Point and Polygon from shapely
+import numpy as np
+from shapely.geometry import Point, shape  # Import Point and the GeoJSON constructor from shapely
+from shapely.strtree import STRtree
 
 base_url = "https://api.daac.asf.alaska.edu/services/search/param"
 
 # Define the point of interest
 point_of_interest = (30.342612, -88.026061)  # (latitude, longitude)
 
-# Function to calculate bearing
-def calculate_bearing(pointA, pointB):
+# Function to calculate bearings from one point to many (arrays of latitudes/longitudes)
+def calculate_bearings(pointA, lats, lons):
     lat1, lon1 = math.radians(pointA[0]), math.radians(pointA[1])
-    lat2, lon2 = math.radians(pointB[0]), math.radians(pointB[1])
+    lat2, lon2 = np.radians(lats), np.radians(lons)
     
     dLon = lon2 - lon1
-    x = math.sin(dLon) * math.cos(lat2)
-    y = math.cos(lat1) * math.sin(lat2) - (math.sin(lat1) * math.cos(lat2) * math.cos(dLon))
+    x = np.sin(dLon) * np.cos(lat2)
+    y = math.cos(lat1) * np.sin(lat2) - (math.sin(lat1) * np.cos(lat2) * np.cos(dLon))
     
-    initial_bearing = math.atan2(x, y)
-    # Convert from radians to degrees
-    initial_bearing = math.degrees(initial_bearing)
-    # Normalize the bearing to 0-360 degrees
-    compass_bearing = (initial_bearing + 360) % 360
-    return compass_bearing
+    # Convert from radians to degrees and normalize the bearings to 0-360 degrees
+    return (np.degrees(np.arctan2(x, y)) + 360) % 360
+
+# Cardinal directions in 45-degree sectors, clockwise from north
+DIRS = ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")
 
 # Function to convert bearing to cardinal direction
 def bearing_to_direction(bearing):
-    if bearing >= 337.5 or bearing < 22.5:
-        return "north"
-    elif 22.5 <= bearing < 67.5:
-        return "northeast"
-    elif 67.5 <= bearing < 112.5:
-        return "east"
-    elif 112.5 <= bearing < 157.5:
-        return "southeast"
-    elif 157.5 <= bearing < 202.5:
-        return "south"
-    elif 202.5 <= bearing < 247.5:
-        return "southwest"
-    elif 247.5 <= bearing < 292.5:
-        return "west"
-    elif 292.5 <= bearing < 337.5:
-        return "northwest"
+    # Shift by half a sector so north covers 337.5-22.5, then index the sector
+    return DIRS[int((bearing + 22.5) // 45) % 8]
 
 # List of satellite platforms to query
 platforms = [
@@ -51,89 +38,89 @@ platforms = [
     "UAVSAR", "RADARSAT-1", "ERS", "JERS-1", "AIRSAR", "SEASAT"
 ]
 
+# Platforms whose instruments are synthetic aperture radars
+SAR_SET = {
+    "Sentinel-1", "SLC-BURST", "OPERA-S1", "ALOS PALSAR", "SIR-C", "ARIA S1 GUNW",
+    "UAVSAR", "RADARSAT-1", "ERS", "JERS-1", "AIRSAR", "SEASAT"
+}
+
+# Function to classify a result as SAR from its platform name or sensor
+def is_sar(properties):
+    # Results report mission names (e.g. "Sentinel-1A", "ALOS"), so fall back to the sensor
+    return properties.get('platform') in SAR_SET or "SAR" in (properties.get('sensor') or "")
+
 # Initialize lists to store results
 sar_results = []
 non_sar_results = []
 
-for platform in platforms:
+async def fetch_platforms():
+    """Query the ASF API for all platforms in one request and return the parsed GeoJSON, or None on error"""
     params = {
-        "platform": platform,
+        "platform": ",".join(platforms),
         "intersectsWith": f"POINT({point_of_interest[1]} {point_of_interest[0]})",  # WKT format for location
         "start": "2025-02-01",  # Start date
         "end": "2025-02-18",    # End date
         "output": "geojson",    # Desired output format
-        "maxResults": 1         # Limit to the nearest result
+        "maxResults": 1000      # Enough to cover every platform
     }
 
     # Send GET request to API
-    response = requests.get(base_url, params=params)
-
-    # Check if request was successful
-    if response.status_code == 200:
-        # Parse the response as JSON
-        data = response.json()
-
-        if data['features']:  # Check if there are any features in the response
-            # Save the full response for the current platform to a JSON file
-            platform_filename = f'response_{platform.replace(" ", "_")}.json'
-            with open(platform_filename, 'w') as json_file:
-                json.dump(data, json_file, indent=4)
-
-            # Initialize variables to track the nearest location
-            nearest_location = None
-            nearest_distance = float('inf')  # Start with an infinitely large distance
-            nearest_bearing = None
-
-            for feature in data['features']:
-                if 'properties' in feature:
-                    # Create a polygon from the coordinates
-                    if 'geometry' in feature and 'coordinates' in feature['geometry']:
-                        coordinates = feature['geometry']['coordinates']
-                        # Flatten the coordinates if necessary
-                        if len(coordinates) > 0 and isinstance(coordinates[0][0], list):
-                            polygon_coords = [(coord[0], coord[1]) for coord_set in coordinates for coord in coord_set]
-                        else:
-                            polygon_coords = [(coord[0], coord[1]) for coord in coordinates]
-
-                        polygon = Polygon(polygon_coords)  # Create a polygon
-
-                        # Create a point from the point of interest
-                        point = Point(point_of_interest[1], point_of_interest[0])  # (longitude, latitude)
-
-                        # Check if the point is inside the polygon
-                        if polygon.contains(point):
-                            distance = 0  # Point is inside the polygon
-                        else:
-                            # Calculate the distance to the nearest point on the polygon
-                            distance = point.distance(polygon)  # Distance to the nearest edge
-
-                        bearing = calculate_bearing(point_of_interest, (polygon.centroid.y, polygon.centroid.x))  # Calculate bearing
-
-                        # Check if this is the nearest location
-                        if distance < nearest_distance:
-                            nearest_distance = distance
-                            nearest_location = (polygon.centroid.y, polygon.centroid.x)  # Use centroid for location
-                            nearest_bearing = bearing
-
-            # Classify the platform as SAR or non-SAR
-            if "SAR" in platform or "ALOS" in platform or "SLC" in platform:
-                sar_results.append({
-                    "platform": platform,
-                    "distance_km": nearest_distance,
-                    "location": nearest_location,
-                    "bearing": nearest_bearing
-                })
-            else:
-                non_sar_results.append({
-                    "platform": platform,
-                    "distance_km": nearest_distance,
-                    "location": nearest_location,
-                    "bearing": nearest_bearing
-                })
-        else:
-            print(f"No features found for platform: {platform}")
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base_url, params=params) as response:
+            # Check if request was successful
+            if response.status == 200:
+                # Parse the response body as JSON
+                return orjson.loads(await response.read())
+            print(f"Error: {response.status} - {await response.text()}")
+            return None
+
+data = asyncio.run(fetch_platforms())
+
+# Group footprints by the platform that produced them and whether it is SAR
+features_by_platform = {}
+footprints = {}
+for feature in (data or {}).get('features', []):
+    if 'properties' in feature:
+        # Build the footprint straight from the GeoJSON geometry
+        if 'geometry' in feature and 'coordinates' in feature['geometry']:
+            platform = feature['properties'].get('platform', 'unknown')
+            key = (platform, is_sar(feature['properties']))
+            features_by_platform.setdefault(platform, []).append(feature)
+            footprints.setdefault(key, []).append(shape(feature['geometry']))
+
+if data is not None and not footprints:
+    print("No features found for any platform")
+
+# Save every platform's results to a single compact JSON Lines file
+with open('responses.jsonl', 'wb') as responses_file:
+    for platform, features in features_by_platform.items():
+        responses_file.write(orjson.dumps({
+            "platform": platform,
+            "data": {"type": "FeatureCollection", "features": features}
+        }) + b"\n")
+
+# Create a point from the point of interest
+point = Point(point_of_interest[1], point_of_interest[0])  # (longitude, latitude)
+
+for (platform, sar), polygons in footprints.items():
+    # Spatial index over the footprints; returns the index of the nearest one
+    nearest = STRtree(polygons).nearest(point)
+    polygon = polygons[nearest]
+
+    # Distance to the nearest edge (0 when the point is inside) and bearing to the centroid
+    centroid = polygon.centroid
+    result = {
+        "platform": platform,
+        "distance_km": point.distance(polygon),
+        "location": (centroid.y, centroid.x),  # Use centroid for location
+        "bearing": float(calculate_bearings(point_of_interest, centroid.y, centroid.x))
+    }
+
+    # Classify the platform as SAR or non-SAR
+    if sar:
+        sar_results.append(result)
     else:
-        print(f"Error: {response.status_code} - {response.text}")
+        non_sar_results.append(result)
 
 # Find the nearest SAR and non-SAR results
 nearest_sar = min(sar_results, key=lambda x: x['distance_km'], default=None)
@@ -146,8 +133,8 @@ final_results = {
 }
 
 # Save the final results to a JSON file
-with open('nearest_results.json', 'w') as json_file:
-    json.dump(final_results, json_file, indent=4)
+with open('nearest_results.json', 'wb') as json_file:
+    json_file.write(orjson.dumps(final_results, option=orjson.OPT_INDENT_2))
 
 # Output the results
 if nearest_sar:
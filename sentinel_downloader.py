@@ -1,26 +1,80 @@
 import os
 from datetime import date, timedelta
+import asyncio
+import aiohttp
 import requests
-import pandas as pd
+import certifi
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urljoin
+from download_utils import CHUNK_SIZE, REDIRECT_STATUSES, preallocate
 import geopandas as gpd
 from shapely.geometry import shape
-import json
 from dotenv import load_dotenv
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
-import subprocess
-import threading
+from streamlit_autorefresh import st_autorefresh
 import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
+import math
+import hashlib
 
 # Load environment variables
 load_dotenv()
 
+# Downloads running at once across the app
+MAX_DOWNLOAD_WORKERS = int(os.getenv("MAX_DOWNLOAD_WORKERS", 8))
+
+# Attempts per download; each retry resumes the .part file with a Range request
+DOWNLOAD_ATTEMPTS = 3
+
+# Minimum seconds between progress events, unless another 1% has arrived
+PROGRESS_INTERVAL = 0.1
+
+# Default NYC area of interest, matching the rectangle drawn by create_map
+DEFAULT_BBOX_WKT = "POLYGON((-74.3 40.4, -74.3 41.0, -73.5 41.0, -73.5 40.4, -74.3 40.4))"
+
+# OData filter for a catalog search, filled in per query
+_FILTER_TMPL = "Collection/Name eq '{coll}' and OData.CSC.Intersects(area=geography'SRID=4326;{bbox}') and ContentDate/Start gt {s}T00:00:00.000Z and ContentDate/Start lt {e}T23:59:59.999Z"
+
+# Products shown per page of result tabs
+PAGE_SIZE = 10
+
+# Seconds an identical catalog search is served from cache
+SEARCH_TTL = 60
+
+# Largest $top the catalog accepts; bigger searches are fetched as several pages
+CATALOG_PAGE_SIZE = 1000
+
+TOKEN_URL = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
+
+# Initial bookkeeping for a product that has not been downloaded yet
+DEFAULT_STATE = {
+    'complete': False,
+    'error': False,
+    'started': False,
+    'progress': 0
+}
+
 if 'download_states' not in st.session_state:
     st.session_state.download_states = {}
 
-def get_keycloak_token(username: str, password: str) -> str:
+def _request_token(data: dict) -> dict:
+    """POST a grant to the token endpoint and return the token with its expiry time"""
+    r = _SESSION.post(TOKEN_URL, data=data)
+    r.raise_for_status()
+    payload = r.json()
+    return {
+        "access_token": payload["access_token"],
+        "refresh_token": payload.get("refresh_token"),
+        # Renew a little early so a request never goes out with a token about to expire
+        "expires_at": time.time() + payload.get("expires_in", 600) - 30,
+    }
+
+def get_keycloak_token(username: str, password: str) -> dict:
     """
     Get access token from Copernicus using username and password
     """
@@ -31,74 +85,279 @@ def get_keycloak_token(username: str, password: str) -> str:
         "grant_type": "password",
     }
     try:
-        r = requests.post(
-            "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token",
-            data=data,
-        )
-        r.raise_for_status()
-        return r.json()["access_token"]
+        return _request_token(data)
+    except requests.HTTPError as e:
+        st.error(f"Error acquiring token: {str(e)}")
+        try:
+            st.error(f"Response: {e.response.json()}")
+        except ValueError:
+            st.error(f"Response: {e.response.text}")
+        return None
     except Exception as e:
         st.error(f"Error acquiring token: {str(e)}")
-        if hasattr(r, 'json'):
-            try:
-                st.error(f"Response: {r.json()}")
-            except:
-                st.error(f"Response: {r.text}")
         return None
 
-def search_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000):
+def refresh_keycloak_token(token: dict) -> dict:
     """
-    Search for products in the Copernicus catalog
+    Mint a new access token from the refresh token; raises if the refresh is rejected
+    """
+    return _request_token({
+        "client_id": "cdse-public",
+        "refresh_token": token["refresh_token"],
+        "grant_type": "refresh_token",
+    })
+
+def get_token(username: str, password: str) -> dict:
+    """
+    Return a valid token for this session, refreshing it or logging in again when it has expired
+    """
+    token = st.session_state.get("cdse_token")
+    # A token minted for other credentials is never reused
+    if token and token["username"] == username:
+        with token["lock"]:
+            if time.time() < token["expires_at"]:
+                return token
+            if token.get("refresh_token"):
+                try:
+                    token.update(refresh_keycloak_token(token))
+                    return token
+                except requests.RequestException:
+                    pass
+    token = get_keycloak_token(username, password)
+    if token:
+        # One lock per token, shared by this thread and every download's provider,
+        # so a rotated refresh token is only ever spent once
+        token["username"] = username
+        token["lock"] = threading.Lock()
+        st.session_state.cdse_token = token
+    return token
+
+def make_token_provider(token: dict):
+    """
+    Callable for download threads that returns a current access token, refreshing the shared token dict in place
+    """
+    def token_provider():
+        with token["lock"]:
+            # Checked under the lock: another thread may have refreshed while this one waited
+            if time.time() >= token["expires_at"] and token.get("refresh_token"):
+                token.update(refresh_keycloak_token(token))
+            return token["access_token"]
+
+    return token_provider
+
+def _bbox_wkt(coords) -> str:
+    """WKT polygon for a closed ring of (lon, lat) pairs; five pairs are cheaper to join than to cache"""
+    return "POLYGON((" + ", ".join(f"{x} {y}" for x, y in coords) + "))"
+
+async def _fetch_page(session, url, params, headers, skip, top):
+    """Fetch one page of catalog results starting at skip"""
+    async with session.get(url, params={**params, "$skip": skip, "$top": top}, headers=headers) as response:
+        response.raise_for_status()
+        return await response.json()
+
+async def _search_all(url, params, headers, result_limit):
+    """Fetch the first page for the total count, then the remaining pages concurrently"""
+    async with aiohttp.ClientSession() as session:
+        first = await _fetch_page(session, url, params, headers, 0, min(result_limit, CATALOG_PAGE_SIZE))
+        wanted = min(result_limit, first.get("@odata.count", 0))
+        rest = await asyncio.gather(*[
+            _fetch_page(session, url, params, headers, skip, min(CATALOG_PAGE_SIZE, wanted - skip))
+            for skip in range(CATALOG_PAGE_SIZE, wanted, CATALOG_PAGE_SIZE)
+        ])
+    first["value"] += [product for page in rest for product in page["value"]]
+    return first
+
+@st.cache_data(ttl=SEARCH_TTL, max_entries=128, show_spinner=False)
+def _search_products_cached(bbox: str, collection: str, start_date: str, end_date: str, result_limit: int, token_hash: str, refresh_nonce: int, _token: str):
+    """
+    Query the catalog; keyed on a token hash (the leading underscore keeps the raw token out of the cache key)
+    and on a per-session refresh counter that "Force refresh" bumps
     """
     url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products"
     params = {
-        "$filter": f"Collection/Name eq '{collection}' and OData.CSC.Intersects(area=geography'SRID=4326;{bbox}') and ContentDate/Start gt {start_date}T00:00:00.000Z and ContentDate/Start lt {end_date}T23:59:59.999Z",
-        "$count": "True",
-        "$top": result_limit
+        "$filter": _FILTER_TMPL.format(coll=collection, bbox=bbox, s=start_date, e=end_date),
+        "$count": "True"
     }
-    headers = {"Authorization": f"Bearer {token}"}
+    headers = {"Authorization": f"Bearer {_token}"}
     
+    # Script reruns have no running event loop, so each search gets its own
+    return asyncio.run(_search_all(url, params, headers, result_limit))
+
+def search_products(token: str, bbox: str, collection: str, start_date: str, end_date: str, result_limit: int = 1000, refresh_nonce: int = 0):
+    """
+    Search for products in the Copernicus catalog
+    """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()[:16]
     try:
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return _search_products_cached(bbox, collection, start_date, end_date, result_limit, token_hash, refresh_nonce, token)
     except Exception as e:
         st.error(f"Error searching catalog: {str(e)}")
         return None
 
-def download_worker(product_id, token, product_name, output_dir, progress_queue):
-    """Worker function to handle download in a separate process"""
+@st.cache_resource
+def get_session():
+    """Pooled session shared by every download thread; retries transient gateway errors"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+    ))
+    # Pin one CA bundle so pooled connections keep reusing the same SSL context
+    session.verify = os.environ.get("REQUESTS_CA_BUNDLE", certifi.where())
+    return session
+
+_SESSION = get_session()
+
+@st.cache_resource
+def get_download_pool():
+    """Thread pool shared by all sessions; bounds how many downloads run at once"""
+    return ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+
+def is_already_downloaded(url, token_provider, output_path):
+    """True when output_path matches the remote Content-Length and the ETag saved beside it"""
+    if not os.path.exists(output_path):
+        return False
+    try:
+        # HEAD through the redirects by hand, like the download itself
+        while True:
+            headers = {"Authorization": f"Bearer {token_provider()}"}
+            response = _SESSION.head(url, headers=headers, allow_redirects=False)
+            if response.status_code not in REDIRECT_STATUSES:
+                break
+            url = urljoin(url, response.headers["Location"])
+    except requests.RequestException:
+        return False
+    
+    content_length = response.headers.get('Content-Length')
+    if not response.ok or content_length is None or int(content_length) != os.path.getsize(output_path):
+        return False
+    etag = response.headers.get('ETag')
+    if etag is None:
+        return True
+    try:
+        with open(output_path + ".etag") as f:
+            return f.read() == etag
+    except OSError:
+        return False
+
+def download_worker(product_id, token_provider, product_name, output_dir, progress_queue):
+    """Worker function to handle download on a pool thread"""
     try:
         output_path = os.path.join(output_dir, f"{product_name}.zip")
-        session = requests.Session()
-        session.headers.update({"Authorization": f"Bearer {token}"})
+        # Bytes land in a .part file that survives failures and is resumed with a Range request
+        temp_path = output_path + ".part"
         
         url = f"https://catalogue.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
         
-        # Follow redirects
-        response = session.get(url, allow_redirects=False)
-        while response.status_code in (301, 302, 303, 307):
-            url = response.headers["Location"]
-            response = session.get(url, allow_redirects=False)
+        if is_already_downloaded(url, token_provider, output_path):
+            progress_queue.put(('complete', output_path))
+            return
         
-        # Get file size
-        file_response = session.get(url, stream=True, verify=False)
-        total_size = int(file_response.headers.get('content-length', 0))
-        
-        # Download with progress
-        downloaded = 0
-        with open(output_path, "wb") as f:
-            for chunk in file_response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    progress = (downloaded / total_size) * 100 if total_size > 0 else 0
-                    progress_queue.put(('progress', progress, downloaded, total_size))
+        etag = None
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            resume_from = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            try:
+                # Follow redirects by hand so the Authorization header survives the
+                # hop to the download host, then stream the final response; the
+                # token is re-read per hop in case it was refreshed meanwhile
+                hop_url = url
+                while True:
+                    headers = {"Authorization": f"Bearer {token_provider()}"}
+                    if resume_from:
+                        headers["Range"] = f"bytes={resume_from}-"
+                    file_response = _SESSION.get(hop_url, headers=headers, stream=True, allow_redirects=False)
+                    if file_response.status_code not in REDIRECT_STATUSES:
+                        break
+                    hop_url = urljoin(hop_url, file_response.headers["Location"])
+                    file_response.close()
+                
+                with file_response:
+                    etag = file_response.headers.get('ETag')
+                    content_range = file_response.headers.get('Content-Range', '')
+                    if file_response.status_code == 416 and resume_from:
+                        # Nothing past the partial file: it is either complete or stale
+                        if content_range.rpartition('/')[2] == str(resume_from):
+                            total_size = downloaded = resume_from
+                            break
+                        os.remove(temp_path)
+                        continue
+                    file_response.raise_for_status()
+                    
+                    if file_response.status_code == 206 and content_range.startswith(f"bytes {resume_from}-"):
+                        # Server honoured the Range header: append to the partial file
+                        mode, downloaded = "ab", resume_from
+                        total_size = int(content_range.rpartition('/')[2])
+                    else:
+                        # Full body (Range ignored or mismatched): start over
+                        mode, downloaded = "wb", 0
+                        total_size = int(file_response.headers.get('content-length', 0))
+                    
+                    # Download with progress; unbuffered since chunks are already 1 MiB
+                    last_emit_t = time.monotonic()
+                    last_emit_bytes = downloaded
+                    with open(temp_path, mode, buffering=0) as f:
+                        preallocate(f.fileno(), total_size)
+                        for chunk in file_response.iter_content(chunk_size=CHUNK_SIZE):
+                            if chunk:
+                                # Raw writes may be short, so loop until the chunk is on disk
+                                view = memoryview(chunk)
+                                while view:
+                                    view = view[f.write(view):]
+                                downloaded += len(chunk)
+                                # Post at most every PROGRESS_INTERVAL or per 1% of the file;
+                                # without a known size only the timer applies
+                                now = time.monotonic()
+                                if (now - last_emit_t > PROGRESS_INTERVAL
+                                        or (total_size > 0 and downloaded - last_emit_bytes > total_size / 100)
+                                        or (total_size and downloaded == total_size)):
+                                    progress_queue.put(('progress', downloaded, total_size))
+                                    last_emit_t = now
+                                    last_emit_bytes = downloaded
+                
+                if total_size and downloaded < total_size:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Connection closed after {downloaded} of {total_size} bytes"
+                    )
+                if total_size and downloaded > total_size:
+                    # More bytes than announced: the partial file can't be trusted
+                    os.remove(temp_path)
+                    raise requests.exceptions.ChunkedEncodingError("Received more data than expected")
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == DOWNLOAD_ATTEMPTS - 1:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+        else:
+            raise RuntimeError(f"Download did not complete after {DOWNLOAD_ATTEMPTS} attempts")
         
+        os.replace(temp_path, output_path)
+        # Remember which version was downloaded so a later click can skip it
+        if etag:
+            with open(output_path + ".etag", "w") as f:
+                f.write(etag)
         progress_queue.put(('complete', output_path))
     except Exception as e:
         progress_queue.put(('error', str(e)))
 
+def _results_to_gdf(products: list, collection: str):
+    """Build the search results GeoDataFrame; called once per search, not per rerun"""
+    if not any('GeoFootprint' in product for product in products):
+        return None
+    
+    # Geometry column built alongside the records so the frame is constructed once
+    geometries = [
+        shape(product['GeoFootprint']) if product.get('GeoFootprint') else None
+        for product in products
+    ]
+    gdf = gpd.GeoDataFrame(products, geometry=geometries, crs="EPSG:4326")
+    
+    # Filter out L1C products if needed
+    if collection == "SENTINEL-2":
+        gdf = gdf[~gdf['Name'].str.contains('L1C', regex=False, na=False)]
+    return gdf
+
+@st.cache_resource
 def create_map(center_lat=40.7, center_lon=-73.9, zoom=10):
     """Create a Folium map with a rectangle drawing tool"""
     m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
@@ -127,6 +386,88 @@ def download_callback(product_id, token, product_name):
             st.session_state[f"download_error_{product_id}"] = True
             st.error(f"Failed to download {product_name}")
 
+def drain_progress():
+    """Apply progress posted by download threads since the last rerun, without blocking"""
+    for product_id, state in st.session_state.download_states.items():
+        if not state['started'] or state['complete'] or state['error']:
+            continue
+        progress_queue = st.session_state.get(f"queue_{product_id}")
+        while progress_queue is not None:
+            try:
+                status, *args = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if status == 'progress':
+                state['downloaded'], state['total_size'] = args
+                state['progress'] = (state['downloaded'] / state['total_size']) * 100 if state['total_size'] > 0 else 0
+            elif status == 'complete':
+                state['complete'] = True
+                state['path'] = args[0]
+            elif status == 'error':
+                state['error'] = True
+                state['error_message'] = args[0]
+
+def render_product_tab(row, state, token):
+    """Render one product's details, download controls and progress"""
+    st.subheader(row['Name'])
+    
+    # Display product info
+    st.json({
+        'ID': row['Id'],
+        'Size': f"{row.get('ContentLength', 0) / (1024*1024):.2f} MB",
+        'Date': row.get('ContentDate', {}).get('Start'),
+        'Cloud Cover': row.get('CloudCover', 'N/A')
+    })
+    
+    # Finished downloads only need a static summary
+    if state['complete']:
+        show_saved_file(state)
+        return
+    
+    # Add download button if not already downloading
+    if not state['started']:
+        output_dir = st.text_input(
+            "Select download directory",
+            value=os.path.join(os.getcwd(), "downloads"),
+            key=f"dir_{row['Id']}"
+        )
+        
+        if st.button("Download", key=f"download_{row['Id']}"):
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+            
+            # Run the download on the shared worker pool
+            state['started'] = True
+            progress_queue = queue.Queue()
+            st.session_state[f"queue_{row['Id']}"] = progress_queue
+            st.session_state[f"future_{row['Id']}"] = get_download_pool().submit(
+                download_worker,
+                row['Id'],
+                make_token_provider(token),
+                row['Name'],
+                output_dir,
+                progress_queue
+            )
+    
+    # Show download status
+    if state['error']:
+        st.error(f"Download failed: {state.get('error_message', 'unknown error')}. Please try again.")
+        if st.button("Retry Download", key=f"retry_{row['Id']}"):
+            state.update(DEFAULT_STATE)
+    elif state['started']:
+        st.info("Download in progress...")
+        st.progress(state['progress'] / 100)
+        if state.get('total_size'):
+            st.write(f"Downloaded: {state['downloaded'] / (1024*1024):.2f} MB / {state['total_size'] / (1024*1024):.2f} MB")
+
+def show_saved_file(state):
+    """Report where a finished download was saved"""
+    file_path = state.get('path')
+    if file_path and os.path.exists(file_path):
+        st.success(f"File saved to: {file_path}")
+    else:
+        st.error("File not found. Please try downloading again.")
+
 def main():
     st.title("Sentinel Data Downloader")
     st.markdown("""
@@ -162,24 +503,26 @@ def main():
         result_limit = st.number_input(
             "Maximum Results",
             min_value=1,
-            max_value=1000,
+            max_value=10 * CATALOG_PAGE_SIZE,
             value=100
         )
+        
+        force_refresh = st.checkbox("Force refresh", help="Ignore cached search results")
     
     # Main content area
     st.header("Area of Interest")
     
     # Create map
     m = create_map()
-    map_data = st_folium(m, width=700, height=500)
+    map_data = st_folium(m, width=700, height=500, key="aoi_map")
     
     # Get bounding box from map
     if map_data.get('last_active_drawing'):
         bounds = map_data['last_active_drawing']['geometry']['coordinates'][0]
-        bbox = f"POLYGON(({bounds[0][0]} {bounds[0][1]}, {bounds[1][0]} {bounds[1][1]}, {bounds[2][0]} {bounds[2][1]}, {bounds[3][0]} {bounds[3][1]}, {bounds[0][0]} {bounds[0][1]}))"
+        bbox = _bbox_wkt([p[:2] for p in bounds[:4]] + [bounds[0][:2]])
     else:
         # Default NYC bounds
-        bbox = "POLYGON((-74.3 40.4, -74.3 41.0, -73.5 41.0, -73.5 40.4, -74.3 40.4))"
+        bbox = DEFAULT_BBOX_WKT
     
     # Search button
     if st.button("Search Products"):
@@ -188,19 +531,24 @@ def main():
             st.stop()
         
         with st.spinner("Authenticating..."):
-            token = get_keycloak_token(username, password)
+            token = get_token(username, password)
             if not token:
                 st.error("Authentication failed")
                 st.stop()
         
+        # A new cache key for this session only; clearing would drop every user's results
+        if force_refresh:
+            st.session_state.refresh_nonce = st.session_state.get('refresh_nonce', 0) + 1
+        
         with st.spinner("Searching products..."):
             results = search_products(
-                token=token,
+                token=token["access_token"],
                 bbox=bbox,
                 collection=collection,
                 start_date=start_date.strftime("%Y-%m-%d"),
                 end_date=end_date.strftime("%Y-%m-%d"),
-                result_limit=result_limit
+                result_limit=result_limit,
+                refresh_nonce=st.session_state.get('refresh_nonce', 0)
             )
         
         if not results or 'value' not in results:
@@ -213,119 +561,38 @@ def main():
         
         st.success(f"Found {total_count} products, displaying {len(products)}")
         
-        # Convert to DataFrame
-        df = pd.DataFrame.from_dict(products)
+        # Keep the built frame so paging, download clicks and autorefresh reruns
+        # neither search again nor rebuild or re-hash the results
+        st.session_state.search_gdf = _results_to_gdf(products, collection)
+    
+    # Pick up progress for every active download, including ones on other pages
+    drain_progress()
+    
+    gdf = st.session_state.get('search_gdf')
+    token = st.session_state.get('cdse_token')
+    if gdf is not None and len(gdf) > 0 and token:
+        # Only the current page of products gets tabs
+        page_count = math.ceil(len(gdf) / PAGE_SIZE)
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key="results_page")
+        offset = (page - 1) * PAGE_SIZE
+        page_df = gdf.iloc[offset:offset + PAGE_SIZE]
         
-        if len(products) > 0:
-            # Add geometry if available
-            if 'GeoFootprint' in df.columns:
-                df['geometry'] = df['GeoFootprint'].apply(shape)
-                gdf = gpd.GeoDataFrame(df).set_geometry('geometry')
-                
-                # Filter out L1C products if needed
-                if collection == "SENTINEL-2":
-                    gdf = gdf[~gdf['Name'].str.contains('L1C')]
-                
-                # Display products in tabs
-                tabs = st.tabs([f"Product {i+1}" for i in range(len(gdf))])
-                
-                # Show download status for each product
-                for i, tab in enumerate(tabs):
-                    with tab:
-                        row = gdf.iloc[i]
-                        st.subheader(row['Name'])
-                        
-                        # Display product info
-                        st.json({
-                            'ID': row['Id'],
-                            'Size': f"{row.get('ContentLength', 0) / (1024*1024):.2f} MB",
-                            'Date': row.get('ContentDate', {}).get('Start'),
-                            'Cloud Cover': row.get('CloudCover', 'N/A')
-                        })
-                        
-                        # Initialize download state if not exists
-                        if row['Id'] not in st.session_state.download_states:
-                            st.session_state.download_states[row['Id']] = {
-                                'complete': False,
-                                'error': False,
-                                'started': False,
-                                'progress': 0
-                            }
-                        
-                        download_state = st.session_state.download_states[row['Id']]
-                        
-                        # Add download button if not already downloading
-                        if not download_state['started'] and not download_state['complete']:
-                            output_dir = st.text_input(
-                                "Select download directory",
-                                value=os.path.join(os.getcwd(), "downloads"),
-                                key=f"dir_{row['Id']}"
-                            )
-                            
-                            if st.button("Download", key=f"download_{row['Id']}"):
-                                if not os.path.exists(output_dir):
-                                    os.makedirs(output_dir)
-                                
-                                # Start download in a separate process
-                                download_state['started'] = True
-                                process = subprocess.Popen(
-                                    [
-                                        'python', 'download_handler.py',
-                                        row['Id'],
-                                        token,
-                                        row['Name'],
-                                        output_dir
-                                    ],
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    text=True
-                                )
-                                
-                                # Store process in session state
-                                st.session_state[f"process_{row['Id']}"] = process
-                        
-                        # Check download progress
-                        if download_state['started']:
-                            process = st.session_state.get(f"process_{row['Id']}")
-                            if process:
-                                # Read output from process
-                                while True:
-                                    line = process.stdout.readline()
-                                    if not line:
-                                        break
-                                    try:
-                                        status = json.loads(line)
-                                        if status['status'] == 'progress':
-                                            download_state['progress'] = status['progress']
-                                            st.progress(status['progress'] / 100)
-                                            st.write(f"Downloaded: {status['downloaded'] / (1024*1024):.2f} MB / {status['total_size'] / (1024*1024):.2f} MB")
-                                        elif status['status'] == 'complete':
-                                            download_state['complete'] = True
-                                            download_state['path'] = status['path']
-                                            st.success("Download complete!")
-                                        elif status['status'] == 'error':
-                                            download_state['error'] = True
-                                            st.error(f"Download failed: {status['error']}")
-                                    except json.JSONDecodeError:
-                                        continue
-                        
-                        # Show download status
-                        if download_state['complete']:
-                            if 'path' in download_state:
-                                file_path = download_state['path']
-                                if os.path.exists(file_path):
-                                    st.success(f"File saved to: {file_path}")
-                                else:
-                                    st.error("File not found. Please try downloading again.")
-                        elif download_state['error']:
-                            st.error("Download failed. Please try again.")
-                            if st.button("Retry Download", key=f"retry_{row['Id']}"):
-                                download_state['error'] = False
-                                download_state['started'] = False
-                                download_state['progress'] = 0
-                        elif download_state['started']:
-                            st.info("Download in progress...")
-                            st.progress(download_state['progress'] / 100)
+        # Display products in tabs
+        tabs = st.tabs([f"Product {offset + i + 1}" for i in range(len(page_df))])
+        
+        # Show download status for each product
+        for i, tab in enumerate(tabs):
+            with tab:
+                row = page_df.iloc[i]
+                state = st.session_state.download_states.setdefault(row['Id'], DEFAULT_STATE.copy())
+                render_product_tab(row, state, token)
+        
+        # Keep rerunning while downloads are active so their progress is picked up
+        if any(
+            state['started'] and not state['complete'] and not state['error']
+            for state in st.session_state.download_states.values()
+        ):
+            st_autorefresh(interval=500, key="download_refresh")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
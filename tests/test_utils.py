@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils import (
+    bearing_to_direction,
+    bearing_to_direction_batch,
+    bbox_wkt,
+    calculate_bearing,
+    calculate_bearings,
+    calculate_distances,
+    process_response,
+    process_responses,
+)
+
+
+def ladder_direction(bearing):
+    # The if-ladder bearing_to_direction replaced, kept as the reference
+    if bearing >= 337.5 or bearing < 22.5:
+        return "north"
+    elif 22.5 <= bearing < 67.5:
+        return "northeast"
+    elif 67.5 <= bearing < 112.5:
+        return "east"
+    elif 112.5 <= bearing < 157.5:
+        return "southeast"
+    elif 157.5 <= bearing < 202.5:
+        return "south"
+    elif 202.5 <= bearing < 247.5:
+        return "southwest"
+    elif 247.5 <= bearing < 292.5:
+        return "west"
+    elif 292.5 <= bearing < 337.5:
+        return "northwest"
+
+
+# Every sector edge, and just either side of it
+BOUNDARIES = [edge + delta for edge in (22.5 + 45 * i for i in range(8)) for delta in (-1e-9, 0.0, 1e-9)]
+
+
+@pytest.mark.parametrize("bearing", BOUNDARIES + [0.0, 45.0, 180.0, 359.999])
+def test_bearing_to_direction_matches_ladder(bearing):
+    assert bearing_to_direction(bearing) == ladder_direction(bearing)
+
+
+@pytest.mark.parametrize("bearing, expected", [
+    (0, "north"),
+    (22.499, "north"),
+    (22.5, "northeast"),
+    (337.5, "north"),
+    (359.999, "north"),
+    (360.0, "north"),
+    # Out-of-range bearings wrap into [0, 360)
+    (360.0000001, "north"),
+    (-22.6, "northwest"),
+    (810, "east"),
+])
+def test_bearing_to_direction(bearing, expected):
+    assert bearing_to_direction(bearing) == expected
+
+
+def test_bearing_to_direction_batch_matches_scalar():
+    bearings = [0, 22.499, 22.5, 337.5, 359.999, 360.0, 360.0000001, -22.6, 810] + BOUNDARIES
+    expected = [bearing_to_direction(b) for b in bearings]
+    assert bearing_to_direction_batch(bearings).tolist() == expected
+
+
+def test_bearing_to_direction_rejects_nan():
+    with pytest.raises(ValueError):
+        bearing_to_direction(math.nan)
+    with pytest.raises(ValueError):
+        bearing_to_direction_batch(np.array([10.0, np.nan]))
+
+
+def scalar_haversine(pointA, pointB):
+    # Reference great-circle distance in meters, one pair at a time
+    lat1, lon1 = math.radians(pointA[0]), math.radians(pointA[1])
+    lat2, lon2 = math.radians(pointB[0]), math.radians(pointB[1])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371000 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+POINTS_A = [(30.342612, -88.026061), (0.0, 0.0), (-45.5, 170.25), (89.0, -179.0)]
+POINTS_B = [(30.5, -87.5), (0.0, 90.0), (-46.0, -175.0), (-89.0, 1.0)]
+
+
+def test_calculate_bearings_matches_calculate_bearing():
+    bearings = calculate_bearings(POINTS_A, POINTS_B)
+    assert bearings.shape == (len(POINTS_A),)
+    for bearing, a, b in zip(bearings, POINTS_A, POINTS_B):
+        assert bearing == pytest.approx(calculate_bearing(a, b))
+
+
+def test_calculate_bearings_broadcasts_single_origin():
+    bearings = calculate_bearings(POINTS_A[0], POINTS_B)
+    assert bearings.shape == (len(POINTS_B),)
+    for bearing, b in zip(bearings, POINTS_B):
+        assert bearing == pytest.approx(calculate_bearing(POINTS_A[0], b))
+
+
+def test_calculate_distances_matches_scalar_haversine():
+    distances = calculate_distances(POINTS_A, POINTS_B)
+    assert distances.shape == (len(POINTS_A),)
+    for distance, a, b in zip(distances, POINTS_A, POINTS_B):
+        assert distance == pytest.approx(scalar_haversine(a, b))
+
+
+def test_calculate_distances_broadcasts_single_origin():
+    distances = calculate_distances(POINTS_A[0], POINTS_B)
+    assert distances.shape == (len(POINTS_B),)
+    for distance, b in zip(distances, POINTS_B):
+        assert distance == pytest.approx(scalar_haversine(POINTS_A[0], b))
+
+
+REFERENCE_POINT = (30.342612, -88.026061)  # (lat, lon)
+
+
+def footprint(min_lon, min_lat, max_lon, max_lat):
+    # ASF-style feature: the ring sits at geometry.coordinates[0][0]
+    ring = [(min_lon, min_lat), (max_lon, min_lat), (max_lon, max_lat), (min_lon, max_lat), (min_lon, min_lat)]
+    return {
+        "properties": {"centerLat": str((min_lat + max_lat) / 2), "centerLon": str((min_lon + max_lon) / 2)},
+        "geometry": {"coordinates": [[ring]]},
+    }
+
+
+FEATURES = {
+    "inside": footprint(-88.5, 30.0, -87.5, 31.0),
+    "outside": footprint(-86.0, 32.0, -85.0, 33.0),
+    # Western edge runs through the reference point's longitude
+    "boundary": footprint(-88.026061, 30.0, -87.0, 31.0),
+    "missing_keys": {"properties": {"centerLat": "30.5"}, "geometry": {"coordinates": [[[]]]}},
+}
+
+
+def assert_same_result(batched, expected):
+    if expected == (None, None, None):
+        assert batched == expected
+        return
+    assert batched[0] == expected[0]
+    assert batched[1] == pytest.approx(expected[1])
+    assert batched[2] == pytest.approx(expected[2])
+
+
+@pytest.mark.parametrize("name", FEATURES)
+def test_process_responses_matches_process_response(name):
+    feature = FEATURES[name]
+    [batched] = process_responses([feature], REFERENCE_POINT)
+    assert_same_result(batched, process_response(feature, REFERENCE_POINT))
+
+
+def test_process_responses_distances():
+    results = process_responses(list(FEATURES.values()), REFERENCE_POINT)
+    distances = {name: result[1] for name, result in zip(FEATURES, results)}
+    assert distances["inside"] == 0
+    assert distances["outside"] > 0
+    assert distances["boundary"] == 0
+    assert distances["missing_keys"] is None
+
+
+def test_process_responses_mixed_batch_keeps_order():
+    features = list(FEATURES.values())
+    for batched, feature in zip(process_responses(features, REFERENCE_POINT), features):
+        assert_same_result(batched, process_response(feature, REFERENCE_POINT))
+
+
+def test_process_responses_empty():
+    assert process_responses([], REFERENCE_POINT) == []
+
+
+def test_bbox_wkt_closes_ring():
+    assert bbox_wkt(-74.3, 40.4, -73.5, 41.0) == (
+        "POLYGON((-74.3 40.4, -74.3 41.0, -73.5 41.0, -73.5 40.4, -74.3 40.4))"
+    )
@@ -2,43 +2,57 @@ try:
     from geopy.distance import geodesic
 except ImportError:
     print("Warning: geopy module not found. Please install it using: pip install geopy")
-    # Define a stub function to prevent errors
-    def geodesic(point1, point2):
-        return type('Distance', (), {'meters': 0})
+    # calculate_distance falls back to haversine below
+    geodesic = None
 
+import shapely
 from shapely.geometry import Point, Polygon
+import functools
 import math
+import numpy as np
 
-def calculate_bearing(pointA, pointB):
-    lat1, lon1 = math.radians(pointA[0]), math.radians(pointA[1])
-    lat2, lon2 = math.radians(pointB[0]), math.radians(pointB[1])
+# WKT builders live here rather than in the Streamlit scripts: an entry script
+# re-executes on every rerun, which would reset a module-level lru_cache
+@functools.lru_cache(maxsize=64)
+def bbox_wkt(min_lon, min_lat, max_lon, max_lat):
+    # WKT polygon for a bounding box
+    return f"POLYGON(({min_lon} {min_lat}, {min_lon} {max_lat}, {max_lon} {max_lat}, {max_lon} {min_lat}, {min_lon} {min_lat}))"
+
+def calculate_bearings(pointsA, pointsB):
+    # Initial bearings between (N, 2) arrays of (lat, lon) points, in degrees
+    pointsA = np.radians(np.asarray(pointsA, dtype=float).reshape(-1, 2))
+    pointsB = np.radians(np.asarray(pointsB, dtype=float).reshape(-1, 2))
+    lat1, lon1 = pointsA[:, 0], pointsA[:, 1]
+    lat2, lon2 = pointsB[:, 0], pointsB[:, 1]
     
     dLon = lon2 - lon1
-    x = math.sin(dLon) * math.cos(lat2)
-    y = math.cos(lat1) * math.sin(lat2) - (math.sin(lat1) * math.cos(lat2) * math.cos(dLon))
+    x = np.sin(dLon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - (np.sin(lat1) * np.cos(lat2) * np.cos(dLon))
     
-    initial_bearing = math.atan2(x, y)
-    initial_bearing = math.degrees(initial_bearing)
-    compass_bearing = (initial_bearing + 360) % 360
-    return compass_bearing
+    return (np.degrees(np.arctan2(x, y)) + 360.) % 360.
+
+def calculate_bearing(pointA, pointB):
+    return float(calculate_bearings(pointA, pointB)[0])
+
+_DIRS = ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")
+_DIRS_ARR = np.array(_DIRS)
 
 def bearing_to_direction(bearing):
-    if bearing >= 337.5 or bearing < 22.5:
-        return "north"
-    elif 22.5 <= bearing < 67.5:
-        return "northeast"
-    elif 67.5 <= bearing < 112.5:
-        return "east"
-    elif 112.5 <= bearing < 157.5:
-        return "southeast"
-    elif 157.5 <= bearing < 202.5:
-        return "south"
-    elif 202.5 <= bearing < 247.5:
-        return "southwest"
-    elif 247.5 <= bearing < 292.5:
-        return "west"
-    elif 292.5 <= bearing < 337.5:
-        return "northwest"
+    # NaN has no direction; raise instead of guessing (callers catch ValueError)
+    if math.isnan(bearing):
+        raise ValueError("bearing is NaN")
+    # Wrap into [0, 360) first so out-of-range bearings still map to a sector
+    bearing = bearing % 360.0
+    # Shift by half a sector so north covers 337.5-22.5, then index the sector
+    return _DIRS[int((bearing + 22.5) // 45) % 8]
+
+def bearing_to_direction_batch(bearings):
+    bearings = np.asarray(bearings, dtype=float)
+    # NaN would cast to an arbitrary sector, so reject it like the scalar version
+    if np.isnan(bearings).any():
+        raise ValueError("bearings contain NaN")
+    bearings = bearings % 360.0
+    return _DIRS_ARR[((bearings + 22.5) // 45).astype(np.int64) % 8]
 
 def process_response(data, reference_point):
     try:
@@ -67,18 +81,62 @@ def process_response(data, reference_point):
         print(f"KeyError: {e} in data: {data}")
         return None, None, None
 
-def calculate_distance(pointA, pointB):
-    # Calculate distance using Shapely or simple math if geopy is not available
-    try:
+def process_responses(features, reference_point):
+    # Batched process_response: one (centroid, distance, bearing) tuple per feature
+    results = [(None, None, None)] * len(features)
+    indices, centroids, polygons = [], [], []
+    for i, data in enumerate(features):
+        try:
+            properties = data['properties']
+            coordinates = data['geometry']['coordinates'][0][0]  # Get the first polygon's coordinates
+            centroid = (float(properties['centerLat']), float(properties['centerLon']))  # Use centerLat and centerLon for location
+        except KeyError as e:
+            print(f"KeyError: {e} in data: {data}")
+            continue
+        indices.append(i)
+        centroids.append(centroid)
+        polygons.append(Polygon(coordinates))
+    
+    if not polygons:
+        return results
+    
+    # Create a Point object for the reference point
+    point_of_interest = Point(reference_point[1], reference_point[0])  # (lon, lat)
+    polygons = np.array(polygons, dtype=object)
+    
+    # Prepare the footprints once so the containment test runs on GEOS prepared
+    # geometries; distances are only computed for the rest, in one vectorized call
+    shapely.prepare(polygons)
+    inside = shapely.contains_xy(polygons, reference_point[1], reference_point[0])
+    distances = np.zeros(len(polygons))
+    distances[~inside] = shapely.distance(polygons[~inside], point_of_interest)
+    
+    # Calculate bearings to all centroids at once
+    bearings = calculate_bearings(reference_point, centroids)
+    
+    for j, i in enumerate(indices):
+        results[i] = (centroids[j], float(distances[j]), float(bearings[j]))
+    return results
+
+def calculate_distances(pointsA, pointsB):
+    # Haversine distances in meters between (N, 2) arrays of (lat, lon) points
+    pointsA = np.radians(np.asarray(pointsA, dtype=float).reshape(-1, 2))
+    pointsB = np.radians(np.asarray(pointsB, dtype=float).reshape(-1, 2))
+    lat1, lon1 = pointsA[:, 0], pointsA[:, 1]
+    lat2, lon2 = pointsB[:, 0], pointsB[:, 1]
+    # Approximate Earth radius in meters
+    R = 6371000
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return R * c
+
+# Pick the distance implementation once instead of trying geopy on every call
+if geodesic is not None:
+    def calculate_distance(pointA, pointB):
         return geodesic(pointA, pointB).meters
-    except:
-        # Fallback to approximate calculation
-        lat1, lon1 = math.radians(pointA[0]), math.radians(pointA[1])
-        lat2, lon2 = math.radians(pointB[0]), math.radians(pointB[1])
-        # Approximate Earth radius in meters
-        R = 6371000
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
\ No newline at end of file
+else:
+    def calculate_distance(pointA, pointB):
+        # Approximate haversine distance in meters
+        return float(calculate_distances(pointA, pointB)[0])